@@ -1,100 +1,300 @@
 import pandas as pd
-import random
+import numpy as np
 from faker import Faker
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+from typing import Optional
+import argparse
+import hashlib
 import json
+import os
+import re
+import shutil
+import yaml
+
+CATEGORIES = ["Electronics", "Clothing", "Home", "Books", "Sports"]
+PAYMENT_METHODS = ["Credit Card", "Debit Card", "UPI", "Net Banking", "Cash"]
+
+# Faker is only used to seed small value pools; rows are then drawn from the
+# pools with NumPy so generation cost no longer grows with Faker call count.
+POOL_SIZE = 1000
+MAX_ITEMS_PER_TRANSACTION = 5
+MAX_QUANTITY = 3
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONFIG_FILE = os.path.join(BASE_DIR, "config", "config.yaml")
+
+RAW_DIR = "data/raw"
+DEFAULT_CHUNK_SIZE = 100_000
+PARTITIONED_TABLES = ["transactions", "transaction_items"]
+
+# --format choices; CSV stays available for the Power BI handoff
+OUTPUT_FORMATS = {"csv": ["csv"], "parquet": ["parquet"], "both": ["csv", "parquet"]}
+PARQUET_COMPRESSION = "zstd"
+
+# "HH:MM:SS" label for every second of the day, indexed by seconds-since-midnight
+TIME_LABELS = np.array([
+    f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in range(86400)
+])
+
+
+# Streams of the seed tree: SeedSequence(seed, spawn_key=(stream, ...))
+SEED_CUSTOMERS, SEED_PRODUCTS, SEED_ADDRESSES, SEED_SHARDS, SEED_PROFILE = range(5)
+
+# Basket redraw rounds before falling back to per-row weighted sampling
+MAX_REDRAW_ROUNDS = 50
+
+_faker = None
+
+
+# ----------------------------
+# HELPERS
+# ----------------------------
+def _get_rng(rng: Optional[np.random.Generator]) -> np.random.Generator:
+    return rng if rng is not None else np.random.default_rng()
+
+
+def seeded_rng(seed: int, *key: int) -> np.random.Generator:
+    """Independent, reproducible generator for one stream of the seed tree."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+def _faker_pool(rng: np.random.Generator, method: str, size: int = POOL_SIZE) -> np.ndarray:
+    """Draws `size` values from a Faker provider, seeded from `rng`."""
+    global _faker
+    if _faker is None:
+        # One instance per process; it is reseeded before every pool
+        _faker = Faker()
+    _faker.seed_instance(int(rng.integers(2**32)))
+    provider = getattr(_faker, method)
+    return np.array([provider() for _ in range(size)], dtype=object)
+
+
+def _format_ids(prefix: str, numbers: np.ndarray, width: int) -> np.ndarray:
+    """Vectorized f"{prefix}{n:0{width}d}"."""
+    return (prefix + pd.Series(numbers).astype(str).str.zfill(width)).to_numpy()
 
-fake = Faker()
 
 # ----------------------------
 # CUSTOMER GENERATION
 # ----------------------------
-def generate_customers(num_customers: int) -> pd.DataFrame:
-    customers = []
-    for i in range(num_customers):
-        customers.append({
-            "customer_id": f"CUST{i+1:05d}",
-            "name": fake.name(),
-            "email": fake.email(),
-            "city": fake.city(),
-            "state": fake.state(),
-            "country": fake.country(),
-            "created_at": fake.date_time_this_decade()
-        })
-    return pd.DataFrame(customers)
+def generate_customers(num_customers: int, rng: Optional[np.random.Generator] = None,
+                       as_of: Optional[date] = None) -> pd.DataFrame:
+    rng = _get_rng(rng)
+    ids = np.arange(1, num_customers + 1)
+
+    first = _faker_pool(rng, "first_name")[rng.integers(0, POOL_SIZE, num_customers)]
+    last = _faker_pool(rng, "last_name")[rng.integers(0, POOL_SIZE, num_customers)]
+    domains = _faker_pool(rng, "free_email_domain", 50)[rng.integers(0, 50, num_customers)]
+
+    # The customer number keeps emails unique however small the name pools are
+    local_part = (
+        pd.Series(first).str.lower() + "." + pd.Series(last).str.lower() + ids.astype(str)
+    ).str.replace(r"[^a-z0-9.]", "", regex=True)
+
+    now = datetime.combine(as_of, datetime.min.time()) if as_of else datetime.now()
+    decade_start = datetime(now.year - now.year % 10, 1, 1)
+    span_us = int((now - decade_start).total_seconds() * 1e6)
+
+    return pd.DataFrame({
+        "customer_id": _format_ids("CUST", ids, 5),
+        "name": first + " " + last,
+        "email": local_part + "@" + domains,
+        "city": _faker_pool(rng, "city")[rng.integers(0, POOL_SIZE, num_customers)],
+        "state": _faker_pool(rng, "state")[rng.integers(0, POOL_SIZE, num_customers)],
+        "country": _faker_pool(rng, "country")[rng.integers(0, POOL_SIZE, num_customers)],
+        "created_at": pd.Timestamp(decade_start)
+                      + pd.to_timedelta(rng.integers(0, span_us, num_customers), unit="us")
+    })
 
 
 # ----------------------------
 # PRODUCT GENERATION
 # ----------------------------
-def generate_products(num_products: int) -> pd.DataFrame:
-    categories = ["Electronics", "Clothing", "Home", "Books", "Sports"]
-    products = []
-    for i in range(num_products):
-        products.append({
-            "product_id": f"PROD{i+1:05d}",
-            "product_name": fake.word().title(),
-            "category": random.choice(categories),
-            "price": round(random.uniform(10, 500), 2)
-        })
-    return pd.DataFrame(products)
+def generate_products(num_products: int, rng: Optional[np.random.Generator] = None) -> pd.DataFrame:
+    rng = _get_rng(rng)
+    names = _faker_pool(rng, "word")[rng.integers(0, POOL_SIZE, num_products)]
+    return pd.DataFrame({
+        "product_id": _format_ids("PROD", np.arange(1, num_products + 1), 5),
+        "product_name": pd.Series(names).str.title(),
+        "category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), num_products)],
+        "price": np.round(rng.uniform(10, 500, num_products), 2)
+    })
+
+
+# ----------------------------
+# WORKLOAD DISTRIBUTION PROFILES
+# ----------------------------
+def key_weights(spec: Optional[dict], num_keys: int, rng: np.random.Generator) -> Optional[np.ndarray]:
+    """
+    Selection probabilities for customer/product keys (None = uniform).
+      zipf:      p(rank k) ~ 1 / k^exponent, hot ranks assigned to random IDs
+      power_law: i.i.d. Pareto(exponent) weights, a heavy tail of hot keys
+    """
+    distribution = (spec or {}).get("distribution", "uniform")
+    if distribution == "uniform":
+        return None
+    if distribution == "zipf":
+        weights = 1.0 / np.arange(1, num_keys + 1) ** spec.get("exponent", 1.0)
+        weights = weights[rng.permutation(num_keys)]
+    elif distribution == "power_law":
+        weights = rng.pareto(spec.get("exponent", 1.5), num_keys) + 1.0
+    else:
+        raise ValueError(f"Unsupported key distribution: {distribution}")
+    return weights / weights.sum()
+
+
+def _basket_weights(spec: Optional[dict], max_items: int) -> Optional[np.ndarray]:
+    """Basket size k in 1..max_items; zipf/power_law give p(k) ~ 1 / k^exponent."""
+    distribution = (spec or {}).get("distribution", "uniform")
+    if distribution == "uniform":
+        return None
+    if distribution not in ("zipf", "power_law"):
+        raise ValueError(f"Unsupported basket size distribution: {distribution}")
+    weights = 1.0 / np.arange(1, max_items + 1) ** spec.get("exponent", 1.0)
+    return weights / weights.sum()
+
+
+def _date_weights(spec: Optional[dict], first_day: np.datetime64, day_span: int) -> Optional[np.ndarray]:
+    """seasonal: days in `peak_months` are `peak_weight` times as likely."""
+    distribution = (spec or {}).get("distribution", "uniform")
+    if distribution == "uniform":
+        return None
+    if distribution != "seasonal":
+        raise ValueError(f"Unsupported date distribution: {distribution}")
+    days = first_day + np.arange(day_span)
+    months = days.astype("datetime64[M]").astype(int) % 12 + 1
+    weights = np.where(np.isin(months, spec.get("peak_months", [11, 12])), spec.get("peak_weight", 3.0), 1.0)
+    return weights / weights.sum()
+
+
+def _draw(rng: np.random.Generator, low: int, high: int, size, weights: Optional[np.ndarray]) -> np.ndarray:
+    """Integers in [low, high) drawn uniformly or with the given weights."""
+    if weights is None:
+        return rng.integers(low, high, size)
+    picks = np.searchsorted(np.cumsum(weights), rng.random(size), side="right")
+    return low + np.minimum(picks, high - low - 1)
+
+
+def resolve_profile(spec: Optional[dict], num_customers: int, num_products: int, seed: int) -> dict:
+    """
+    Turns a config.yaml profile into the arrays generation draws from. Key
+    weights are drawn once from the (seed, profile) stream, so every shard
+    sees the same hot keys.
+    """
+    spec = spec or {}
+    rng = seeded_rng(seed, SEED_PROFILE)
+    return {
+        "customers": key_weights(spec.get("customers"), num_customers, rng),
+        "products": key_weights(spec.get("products"), num_products, rng),
+        "dates": spec.get("dates"),
+        "basket_size": spec.get("basket_size")
+    }
 
 
 # ----------------------------
 # TRANSACTION GENERATION
 # ----------------------------
-def generate_transactions(num_transactions: int, customers_df: pd.DataFrame) -> pd.DataFrame:
-    payment_methods = ["Credit Card", "Debit Card", "UPI", "Net Banking", "Cash"]
-    transactions = []
+def generate_transactions(num_transactions: int, customers_df: pd.DataFrame,
+                          rng: Optional[np.random.Generator] = None,
+                          start_id: int = 1,
+                          addresses: Optional[np.ndarray] = None,
+                          as_of: Optional[date] = None,
+                          profile: Optional[dict] = None) -> pd.DataFrame:
+    rng = _get_rng(rng)
+    profile = profile or {}
 
-    for i in range(num_transactions):
-        customer = customers_df.sample(1).iloc[0]
-        date = fake.date_this_year()
+    customer_ids = customers_df["customer_id"].to_numpy()
+    if addresses is None:
+        addresses = _faker_pool(rng, "address")
 
-        transactions.append({
-            "transaction_id": f"TXN{i+1:06d}",
-            "customer_id": customer["customer_id"],
-            "transaction_date": date,
-            "transaction_time": fake.time(),
-            "payment_method": random.choice(payment_methods),
-            "shipping_address": fake.address(),
-            "total_amount": 0.0  # will be recalculated later
-        })
+    # Same window as Faker's date_this_year(): Jan 1st up to today
+    today = as_of or date.today()
+    year_start = np.datetime64(date(today.year, 1, 1), "D")
+    day_span = (today - date(today.year, 1, 1)).days + 1
+    date_weights = _date_weights(profile.get("dates"), year_start, day_span)
 
-    return pd.DataFrame(transactions)
+    return pd.DataFrame({
+        "transaction_id": _format_ids("TXN", np.arange(start_id, start_id + num_transactions), 6),
+        "customer_id": customer_ids[_draw(rng, 0, len(customer_ids), num_transactions, profile.get("customers"))],
+        "transaction_date": year_start + _draw(rng, 0, day_span, num_transactions, date_weights),
+        "transaction_time": TIME_LABELS[rng.integers(0, 86400, num_transactions)],
+        "payment_method": np.array(PAYMENT_METHODS, dtype=object)[
+            rng.integers(0, len(PAYMENT_METHODS), num_transactions)
+        ],
+        "shipping_address": addresses[rng.integers(0, len(addresses), num_transactions)],
+        "total_amount": 0.0  # filled in by generate_transaction_items
+    })
 
 
 # ----------------------------
 # TRANSACTION ITEMS
 # ----------------------------
-def generate_transaction_items(transactions_df: pd.DataFrame, products_df: pd.DataFrame) -> pd.DataFrame:
-    items = []
+def _distinct_product_draws(rng: np.random.Generator, basket_sizes: np.ndarray, num_products: int,
+                            weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Draws a (transactions x max basket) matrix of product indices where the
+    first `basket_sizes[i]` entries of row i are distinct. Rows with a
+    duplicate are redrawn whole, so with uniform weights each basket is a
+    uniform sample without replacement (same as products_df.sample(n)).
+    Under heavy skew the few rows still pending after MAX_REDRAW_ROUNDS are
+    sampled one by one.
+    """
+    width = int(basket_sizes.max(initial=0))
+    unused = np.arange(width) >= basket_sizes[:, None]
+    # Unique negative sentinels so unused slots never collide
+    sentinels = -np.arange(1, width + 1)
+
+    draws = np.empty((len(basket_sizes), width), dtype=np.int64)
+    pending = np.ones(len(basket_sizes), dtype=bool)
+    for _ in range(MAX_REDRAW_ROUNDS):
+        if not pending.any():
+            return draws
+        draws[pending] = _draw(rng, 0, num_products, (int(pending.sum()), width), weights)
+        checked = np.where(unused, sentinels, draws)
+        checked.sort(axis=1)
+        pending = (checked[:, 1:] == checked[:, :-1]).any(axis=1)
+
+    for row in np.flatnonzero(pending):
+        size = basket_sizes[row]
+        draws[row, :size] = rng.choice(num_products, size, replace=False, p=weights)
+    return draws
 
-    for _, txn in transactions_df.iterrows():
-        num_items = random.randint(1, 5)
-        selected_products = products_df.sample(num_items)
 
-        total_amount = 0
+def generate_transaction_items(transactions_df: pd.DataFrame, products_df: pd.DataFrame,
+                               rng: Optional[np.random.Generator] = None,
+                               max_items: int = MAX_ITEMS_PER_TRANSACTION,
+                               profile: Optional[dict] = None) -> pd.DataFrame:
+    rng = _get_rng(rng)
+    profile = profile or {}
+    num_transactions = len(transactions_df)
+    num_products = len(products_df)
 
-        for _, prod in selected_products.iterrows():
-            quantity = random.randint(1, 3)
-            line_total = round(quantity * prod["price"], 2)
-            total_amount += line_total
+    max_items = min(max_items, num_products)
+    basket_sizes = _draw(rng, 1, max_items + 1, num_transactions,
+                         _basket_weights(profile.get("basket_size"), max_items))
+    draws = _distinct_product_draws(rng, basket_sizes, num_products, profile.get("products"))
 
-            items.append({
-                "transaction_id": txn["transaction_id"],
-                "product_id": prod["product_id"],
-                "quantity": quantity,
-                "price_at_time": prod["price"],
-                "line_total": line_total
-            })
+    # Flatten the used slots row by row so items stay grouped per transaction
+    used = np.arange(draws.shape[1]) < basket_sizes[:, None]
+    txn_index = np.repeat(np.arange(num_transactions), basket_sizes)
+    product_index = draws[used]
 
-        transactions_df.loc[
-            transactions_df["transaction_id"] == txn["transaction_id"],
-            "total_amount"
-        ] = round(total_amount, 2)
+    prices = products_df["price"].to_numpy()[product_index]
+    quantity = rng.integers(1, MAX_QUANTITY + 1, len(product_index))
+    line_total = np.round(quantity * prices, 2)
 
-    return pd.DataFrame(items)
+    transactions_df["total_amount"] = np.round(
+        np.bincount(txn_index, weights=line_total, minlength=num_transactions), 2
+    )
+
+    return pd.DataFrame({
+        "transaction_id": transactions_df["transaction_id"].to_numpy()[txn_index],
+        "product_id": products_df["product_id"].to_numpy()[product_index],
+        "quantity": quantity,
+        "price_at_time": prices,
+        "line_total": line_total
+    })
 
 
 # ----------------------------
@@ -113,26 +313,748 @@ def validate_referential_integrity(customers, products, transactions, items) ->
 
 
 # ----------------------------
-# MAIN EXECUTION
+# STREAMING REFERENTIAL INTEGRITY CHECK
 # ----------------------------
-if __name__ == "__main__":
-    customers_df = generate_customers(100)
-    products_df = generate_products(50)
-    transactions_df = generate_transactions(300, customers_df)
-    items_df = generate_transaction_items(transactions_df, products_df)
+# parent table -> (key column, ID prefix, digits the number is zero-padded to)
+PARENT_KEYS = {
+    "customers": ("customer_id", "CUST", 5),
+    "products": ("product_id", "PROD", 5),
+    "transactions": ("transaction_id", "TXN", 6)
+}
+# (child table, foreign key column, parent table)
+FOREIGN_KEYS = [
+    ("transactions", "customer_id", "customers"),
+    ("transaction_items", "product_id", "products"),
+    ("transaction_items", "transaction_id", "transactions")
+]
+VALIDATION_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+ORPHAN_SAMPLE_SIZE = 10
 
-    metadata = validate_referential_integrity(
-        customers_df, products_df, transactions_df, items_df
-    )
 
-    # Save CSVs
-    customers_df.to_csv("data/raw/customers.csv", index=False)
-    products_df.to_csv("data/raw/products.csv", index=False)
-    transactions_df.to_csv("data/raw/transactions.csv", index=False)
-    items_df.to_csv("data/raw/transaction_items.csv", index=False)
+def dataset_files(raw_dir: str, table: str) -> list:
+    """Flat file or month partitions of a dataset, Parquet before CSV."""
+    for fmt in ("parquet", "csv"):
+        flat_path = os.path.join(raw_dir, f"{table}.{fmt}")
+        if os.path.exists(flat_path):
+            return [flat_path]
+        partition_dir = os.path.join(raw_dir, table)
+        if os.path.isdir(partition_dir):
+            partitions = sorted(
+                os.path.join(partition_dir, name) for name in os.listdir(partition_dir) if name.endswith(f".{fmt}")
+            )
+            if partitions:
+                return partitions
+    return []
+
+
+def iter_column(files: list, column: str, chunk_size: int = VALIDATION_CHUNK_SIZE):
+    """Yields one column of a dataset as Series chunks, never the whole table."""
+    for path in files:
+        if path.endswith(".parquet"):
+            pa = _require_pyarrow()
+            for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=[column]):
+                yield batch.column(0).to_pandas()
+        else:
+            for chunk in pd.read_csv(path, usecols=[column], dtype={column: str}, chunksize=chunk_size):
+                yield chunk[column]
+
+
+def encode_keys(ids: pd.Series, prefix: str, width: int) -> np.ndarray:
+    """
+    'CUST00042' -> 42, for IDs in the canonical form _format_ids writes
+    (prefix, then the number zero-padded to width digits), so each code
+    stands for exactly one string. Anything else ('CUST42', 'CUST42.0',
+    'CUST 42', ...) becomes -1 and has to be compared as a string.
+    """
+    # Up to 18 digits, so every number fits in int64
+    canonical = re.compile(rf"{re.escape(prefix)}([0-9]{{{width}}}|[1-9][0-9]{{{width},17}})")
+    matches = (canonical.fullmatch(value) for value in ids.astype(str))
+    # Plain iteration: Series.str would leave one reference cycle per chunk
+    # for the garbage collector, so memory would grow with the row count
+    return np.fromiter((int(m.group(1)) if m else -1 for m in matches), dtype=np.int64, count=len(ids))
+
+
+class CompactKeySet:
+    """
+    Membership set over integer-encoded IDs, filled chunk by chunk with add().
+    Dense ID ranges, which generated IDs are, use a bitmap (one bit per
+    possible ID) grown as larger IDs arrive; once that would cost more than
+    8 bytes per key it turns into a sorted unique array probed with
+    searchsorted. Either way memory follows the parent key count, and a
+    chunk is never held beyond its own add().
+    """
+
+    def __init__(self, codes: Optional[np.ndarray] = None):
+        self.size = 0
+        self.kind = "bitmap"
+        self._bits = np.zeros(0, dtype=np.uint8)
+        self._codes = None
+        if codes is not None:
+            self.add(codes)
+
+    def add(self, codes: np.ndarray):
+        codes = np.unique(codes[codes >= 0])
+        if not len(codes):
+            return
+        if self.kind == "bitmap":
+            max_code = int(codes[-1])
+            if max_code + 1 > 64 * (self.size + len(codes)):
+                self._codes = np.flatnonzero(np.unpackbits(self._bits, bitorder="little"))
+                self._bits = None
+                self.kind = "sorted_array"
+            else:
+                needed = (max_code >> 3) + 1
+                if needed > len(self._bits):
+                    # Doubling keeps the number of reallocations logarithmic
+                    grown = np.zeros(max(needed, 2 * len(self._bits)), dtype=np.uint8)
+                    grown[:len(self._bits)] = self._bits
+                    self._bits = grown
+                new = codes[~self.contains(codes)]
+                np.bitwise_or.at(self._bits, new >> 3, (1 << (new & 7)).astype(np.uint8))
+                self.size += len(new)
+                return
+        self._codes = np.union1d(self._codes, codes)
+        self.size = len(self._codes)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._bits.nbytes if self.kind == "bitmap" else self._codes.nbytes)
+
+    def contains(self, codes: np.ndarray) -> np.ndarray:
+        if self.kind == "bitmap":
+            in_range = (codes >= 0) & (codes < 8 * len(self._bits))
+            safe = np.where(in_range, codes, 0)
+            if not len(self._bits):
+                return in_range
+            bits = (self._bits[safe >> 3] >> (safe & 7)) & 1
+            return in_range & bits.astype(bool)
+        if not self.size:
+            return np.zeros(len(codes), dtype=bool)
+        pos = np.minimum(np.searchsorted(self._codes, codes), self.size - 1)
+        return self._codes[pos] == codes
+
+
+def validate_referential_integrity_streaming(raw_dir: str = RAW_DIR, chunk_size: int = VALIDATION_CHUNK_SIZE,
+                                             sample_size: int = ORPHAN_SAMPLE_SIZE) -> dict:
+    """
+    Checks every foreign key of the raw layer without loading whole tables:
+    each parent key column is read once into a CompactKeySet (plus a set of
+    the exact strings of any non-canonical IDs), then child files are
+    streamed chunk by chunk against it. Reports orphan counts and a sample
+    of orphan keys per relationship, plus the *_fk_valid flags of
+    validate_referential_integrity().
+    """
+    key_sets, exact_keys = {}, {}
+    for parent, (column, prefix, width) in PARENT_KEYS.items():
+        files = dataset_files(raw_dir, parent)
+        if not files:
+            raise FileNotFoundError(f"Missing mandatory dataset: {parent} in {raw_dir}")
+        key_sets[parent], exact_keys[parent] = CompactKeySet(), set()
+        for chunk in iter_column(files, column, chunk_size):
+            codes = encode_keys(chunk, prefix, width)
+            key_sets[parent].add(codes)
+            exact_keys[parent].update(chunk.astype(str)[codes < 0])
+
+    relationships = {}
+    for child, column, parent in FOREIGN_KEYS:
+        _, prefix, width = PARENT_KEYS[parent]
+        child_rows = orphan_rows = 0
+        samples = []
+        for chunk in iter_column(dataset_files(raw_dir, child), column, chunk_size):
+            codes = encode_keys(chunk, prefix, width)
+            found = key_sets[parent].contains(codes)
+            other = codes < 0
+            if other.any():
+                found[other] = chunk.astype(str)[other].isin(exact_keys[parent]).to_numpy()
+            child_rows += len(chunk)
+            orphan_rows += int((~found).sum())
+            if len(samples) < sample_size and not found.all():
+                for key in pd.unique(chunk[~found]):
+                    if key not in samples and len(samples) < sample_size:
+                        samples.append(key)
+
+        relationships[f"{child}.{column} -> {parent}.{column}"] = {
+            "child_rows": child_rows,
+            "orphan_rows": orphan_rows,
+            "orphan_sample": samples,
+            "valid": orphan_rows == 0
+        }
+
+    return {
+        "customer_fk_valid": relationships["transactions.customer_id -> customers.customer_id"]["valid"],
+        "product_fk_valid": relationships["transaction_items.product_id -> products.product_id"]["valid"],
+        "transaction_fk_valid": relationships["transaction_items.transaction_id -> transactions.transaction_id"]["valid"],
+        "parent_key_sets": {
+            parent: {"keys": key_set.size + len(exact_keys[parent]), "representation": key_set.kind,
+                     "bytes": key_set.nbytes, "exact_keys": len(exact_keys[parent])}
+            for parent, key_set in key_sets.items()
+        },
+        "relationships": relationships
+    }
+
+
+# ----------------------------
+# COLUMNAR (PARQUET) OUTPUT
+# ----------------------------
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def arrow_schema(table: str):
+    """Explicit Arrow schema of each raw dataset, so readers never guess dtypes."""
+    pa = _require_pyarrow()
+    label = pa.dictionary(pa.int8(), pa.string())
+    schemas = {
+        "customers": pa.schema([
+            ("customer_id", pa.string()),
+            ("name", pa.string()),
+            ("email", pa.string()),
+            ("city", pa.string()),
+            ("state", pa.string()),
+            ("country", pa.string()),
+            ("created_at", pa.timestamp("us"))
+        ]),
+        "products": pa.schema([
+            ("product_id", pa.string()),
+            ("product_name", pa.string()),
+            ("category", label),
+            ("price", pa.float64())
+        ]),
+        "transactions": pa.schema([
+            ("transaction_id", pa.string()),
+            ("customer_id", pa.string()),
+            ("transaction_date", pa.date32()),
+            ("transaction_time", pa.string()),
+            ("payment_method", label),
+            ("shipping_address", pa.string()),
+            ("total_amount", pa.float64())
+        ]),
+        "transaction_items": pa.schema([
+            ("transaction_id", pa.string()),
+            ("product_id", pa.string()),
+            ("quantity", pa.int16()),
+            ("price_at_time", pa.float64()),
+            ("line_total", pa.float64())
+        ])
+    }
+    return schemas[table]
+
+
+def to_arrow(df: pd.DataFrame, table: str):
+    """Converts a generated DataFrame to an Arrow table with the declared schema."""
+    pa = _require_pyarrow()
+    schema = arrow_schema(table)
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        if pa.types.is_date32(field.type):
+            arrays.append(pa.array(values.to_numpy().astype("datetime64[D]"), type=field.type))
+        elif pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode().cast(field.type))
+        else:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_table(df: pd.DataFrame, table: str, output_dir: str, formats: list):
+    """Writes a whole dataset as data/raw/<table>.csv and/or .parquet."""
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{table}.{fmt}")
+        if fmt == "csv":
+            df.to_csv(path, index=False)
+        else:
+            pa = _require_pyarrow()
+            pa.parquet.write_table(to_arrow(df, table), path, compression=PARQUET_COMPRESSION)
+
+
+# ----------------------------
+# STREAMING (CHUNKED, PARTITIONED, SHARDED) OUTPUT
+# ----------------------------
+def partition_path(output_dir: str, table: str, partition: str, shard: Optional[int] = None,
+                   fmt: str = "csv") -> str:
+    """data/raw/<table>/<table>_<YYYY-MM>[-s<shard>].<fmt>"""
+    suffix = f"-s{shard:03d}" if shard is not None else ""
+    return os.path.join(output_dir, table, f"{table}_{partition}{suffix}.{fmt}")
+
+
+def _append_partitions(df: pd.DataFrame, keys: np.ndarray, table: str, path_for, formats: list,
+                       manifest: dict, writers: dict):
+    """
+    Appends each partition's rows to its file: CSVs are opened in append mode,
+    Parquet files get a new row group through a writer kept open per file.
+    """
+    for partition, part_df in df.groupby(keys, sort=True):
+        for fmt in formats:
+            path = path_for(partition, fmt)
+            if fmt == "csv":
+                part_df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+            else:
+                if path not in writers:
+                    pa = _require_pyarrow()
+                    writers[path] = pa.parquet.ParquetWriter(path, arrow_schema(table),
+                                                             compression=PARQUET_COMPRESSION)
+                writers[path].write_table(to_arrow(part_df, table))
+            entry = manifest.setdefault(path, {"partition": partition, "format": fmt, "path": path, "rows": 0})
+            entry["rows"] += len(part_df)
+
+
+def _generate_shard(task: dict) -> dict:
+    """
+    Generates transactions [start_id, start_id + count) in chunks, with a
+    generator derived only from (seed, shard), and appends them to files owned
+    by this shard. Runs in a worker process.
+    """
+    rng = seeded_rng(task["seed"], SEED_SHARDS, task["shard"])
+    shard = task["shard"] if task["workers"] > 1 else None
+    output_dir, customers_df, products_df = task["output_dir"], task["customers"], task["products"]
+
+    manifests = {table: {} for table in PARTITIONED_TABLES}
+    counts = {table: 0 for table in PARTITIONED_TABLES}
+    writers = {}
+    customer_fk_valid = product_fk_valid = transaction_fk_valid = True
+    end_id = task["start_id"] + task["count"]
+
+    for start in range(task["start_id"], end_id, task["chunk_size"]):
+        size = min(task["chunk_size"], end_id - start)
+        transactions_df = generate_transactions(size, customers_df, rng, start_id=start,
+                                                addresses=task["addresses"], as_of=task["as_of"],
+                                                profile=task["profile"])
+        items_df = generate_transaction_items(transactions_df, products_df, rng, task["max_items"],
+                                              profile=task["profile"])
+
+        customer_fk_valid &= bool(transactions_df["customer_id"].isin(customers_df["customer_id"]).all())
+        product_fk_valid &= bool(items_df["product_id"].isin(products_df["product_id"]).all())
+        transaction_fk_valid &= bool(items_df["transaction_id"].isin(transactions_df["transaction_id"]).all())
+
+        if task["partitioned"]:
+            # Items live in the same month partition as their parent transaction
+            txn_keys = pd.Series(
+                transactions_df["transaction_date"].dt.strftime("%Y-%m").to_numpy(),
+                index=transactions_df["transaction_id"]
+            )
+            item_keys = items_df["transaction_id"].map(txn_keys).to_numpy()
+            txn_keys = txn_keys.to_numpy()
+        else:
+            txn_keys = np.full(len(transactions_df), "all")
+            item_keys = np.full(len(items_df), "all")
+
+        for table, df, keys in (("transactions", transactions_df, txn_keys),
+                                ("transaction_items", items_df, item_keys)):
+            _append_partitions(df, keys, table,
+                               lambda part, fmt: partition_path(output_dir, table, part, shard, fmt),
+                               task["formats"], manifests[table], writers)
+            counts[table] += len(df)
+
+        print(f"✓ Chunk {start}-{start + size - 1} written ({len(items_df)} items)")
+
+    for writer in writers.values():
+        writer.close()
+
+    return {
+        "counts": counts,
+        "customer_fk_valid": customer_fk_valid,
+        "product_fk_valid": product_fk_valid,
+        "transaction_fk_valid": transaction_fk_valid,
+        "partitions": {table: list(manifest.values()) for table, manifest in manifests.items()}
+    }
+
+
+def _merge_shard_files(entries: list, path: str):
+    """
+    Concatenates shard files in shard order: CSV bytes keeping only the first
+    header, Parquet row groups through a single writer.
+    """
+    if path.endswith(".parquet"):
+        pa = _require_pyarrow()
+        writer = None
+        for entry in entries:
+            shard_file = pa.parquet.ParquetFile(entry["path"])
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(path, shard_file.schema_arrow, compression=PARQUET_COMPRESSION)
+            for i in range(shard_file.num_row_groups):
+                writer.write_table(shard_file.read_row_group(i))
+        if writer is not None:
+            writer.close()
+        return
+
+    with open(path, "wb") as out:
+        for i, entry in enumerate(entries):
+            with open(entry["path"], "rb") as part:
+                if i > 0:
+                    part.readline()
+                shutil.copyfileobj(part, out)
+
+
+def generate_streaming(num_transactions: int, customers_df: pd.DataFrame, products_df: pd.DataFrame,
+                       output_dir: str = RAW_DIR, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       seed: Optional[int] = None, workers: int = 1, partitioned: bool = True,
+                       as_of: Optional[date] = None, formats: Optional[list] = None,
+                       max_items: int = MAX_ITEMS_PER_TRANSACTION,
+                       profile: Optional[dict] = None) -> dict:
+    """
+    Generates transactions and their items `chunk_size` transactions at a time,
+    so peak memory depends on the chunk size rather than `num_transactions`.
+
+    The transaction ID space is split into `workers` contiguous shards built in
+    a process pool. Each shard draws from its own (seed, shard) generator and
+    writes its own files, so the output is byte-for-byte reproducible for a
+    given seed, worker count, chunk size and `as_of` date. With `partitioned`
+    the files are month partitions under data/raw/<table>/; otherwise the shards
+    are merged into data/raw/<table>.csv. `formats` selects CSV and/or Parquet
+    files. `profile` is a resolve_profile() result. Returns the metadata dict,
+    including the partition manifest.
+    """
+    formats = formats or ["csv"]
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    profile = profile or resolve_profile(None, len(customers_df), len(products_df), seed)
+    as_of = as_of or date.today()
+    addresses = _faker_pool(seeded_rng(seed, SEED_ADDRESSES), "address")
+
+    # A streamed run always starts from empty partitions
+    for table in PARTITIONED_TABLES:
+        shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+        os.makedirs(os.path.join(output_dir, table))
+
+    workers = max(1, min(workers, num_transactions))
+    bounds = np.linspace(0, num_transactions, workers + 1).astype(int)
+    tasks = [{
+        "shard": shard,
+        "workers": workers,
+        "seed": seed,
+        "start_id": int(bounds[shard]) + 1,
+        "count": int(bounds[shard + 1] - bounds[shard]),
+        "chunk_size": chunk_size,
+        "max_items": max_items,
+        "profile": profile,
+        "partitioned": partitioned,
+        "formats": formats,
+        "output_dir": output_dir,
+        "as_of": as_of,
+        "addresses": addresses,
+        "customers": customers_df[["customer_id"]],
+        "products": products_df[["product_id", "price"]]
+    } for shard in range(workers)]
+
+    if workers == 1:
+        results = [_generate_shard(tasks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_generate_shard, tasks))
+
+    partitions = {table: [] for table in PARTITIONED_TABLES}
+    for table in PARTITIONED_TABLES:
+        for result in results:
+            partitions[table].extend(result["partitions"][table])
+
+    if not partitioned:
+        for table in PARTITIONED_TABLES:
+            for fmt in formats:
+                flat_path = os.path.join(output_dir, f"{table}.{fmt}")
+                _merge_shard_files([e for e in partitions[table] if e["format"] == fmt], flat_path)
+            shutil.rmtree(os.path.join(output_dir, table))
+            partitions[table] = []
+
+    for entries in partitions.values():
+        for entry in entries:
+            entry["bytes"] = os.path.getsize(entry["path"])
+
+    metadata = {
+        "customers": int(len(customers_df)),
+        "products": int(len(products_df)),
+        "transactions": sum(r["counts"]["transactions"] for r in results),
+        "transaction_items": sum(r["counts"]["transaction_items"] for r in results),
+        "customer_fk_valid": all(r["customer_fk_valid"] for r in results),
+        "product_fk_valid": all(r["product_fk_valid"] for r in results),
+        "transaction_fk_valid": all(r["transaction_fk_valid"] for r in results),
+        "seed": int(seed),
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "as_of": as_of.isoformat(),
+        "formats": formats
+    }
+    if partitioned:
+        metadata["partitions"] = partitions
+    return metadata
+
+
+# ----------------------------
+# DATASET BUILD
+# ----------------------------
+def generate_dataset(output_dir: str, num_customers: int, num_products: int, num_transactions: int,
+                     seed: int, as_of: date, formats: list, stream: bool = False, workers: int = 1,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     max_items: int = MAX_ITEMS_PER_TRANSACTION,
+                     profile_spec: Optional[dict] = None, validate: bool = False) -> dict:
+    """
+    Builds all four datasets into `output_dir` and returns their metadata.
+    `profile_spec` is one of the config.yaml workload profiles; `validate`
+    re-checks the written files with the streaming integrity validator, which
+    streamed and sharded runs always do since no step sees whole tables.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    _remove_stale_outputs(output_dir, stream, formats)
+
+    customers_df = generate_customers(num_customers, seeded_rng(seed, SEED_CUSTOMERS), as_of=as_of)
+    products_df = generate_products(num_products, seeded_rng(seed, SEED_PRODUCTS))
+    profile = resolve_profile(profile_spec, num_customers, num_products, seed)
+
+    if stream or workers > 1:
+        metadata = generate_streaming(
+            num_transactions, customers_df, products_df,
+            output_dir=output_dir, chunk_size=chunk_size, seed=seed,
+            workers=workers, partitioned=stream, as_of=as_of, formats=formats, max_items=max_items,
+            profile=profile
+        )
+    else:
+        rng = seeded_rng(seed, SEED_SHARDS, 0)
+        addresses = _faker_pool(seeded_rng(seed, SEED_ADDRESSES), "address")
+        transactions_df = generate_transactions(num_transactions, customers_df, rng,
+                                                addresses=addresses, as_of=as_of, profile=profile)
+        items_df = generate_transaction_items(transactions_df, products_df, rng, max_items, profile=profile)
+
+        metadata = validate_referential_integrity(
+            customers_df, products_df, transactions_df, items_df
+        )
+        metadata.update({"seed": int(seed), "workers": 1, "as_of": as_of.isoformat(), "formats": formats})
+
+        write_table(transactions_df, "transactions", output_dir, formats)
+        write_table(items_df, "transaction_items", output_dir, formats)
+
+    metadata["profile"] = profile_spec or {}
+
+    # Save datasets
+    write_table(customers_df, "customers", output_dir, formats)
+    write_table(products_df, "products", output_dir, formats)
+
+    if validate or stream or workers > 1:
+        metadata["referential_integrity"] = validate_referential_integrity_streaming(output_dir)
+        for flag in ("customer_fk_valid", "product_fk_valid", "transaction_fk_valid"):
+            metadata[flag] = metadata["referential_integrity"][flag]
 
     # Save metadata
-    with open("data/raw/generation_metadata.json", "w") as f:
+    with open(os.path.join(output_dir, "generation_metadata.json"), "w") as f:
         json.dump(metadata, f, indent=4)
 
+    return metadata
+
+
+def _remove_stale_outputs(output_dir: str, stream: bool, formats: list):
+    """
+    Removes the layout and formats a run does not produce, so ingestion only
+    ever finds the current dataset.
+    """
+    for table in ["customers", "products"] + PARTITIONED_TABLES:
+        partitioned_table = stream and table in PARTITIONED_TABLES
+        for fmt in OUTPUT_FORMATS["both"]:
+            flat_path = os.path.join(output_dir, f"{table}.{fmt}")
+            if os.path.exists(flat_path) and (partitioned_table or fmt not in formats):
+                os.remove(flat_path)
+        if table in PARTITIONED_TABLES and not stream:
+            shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+
+
+# ----------------------------
+# SCALE-FACTOR BENCHMARK DATASETS
+# ----------------------------
+def load_generation_config(config_file: str = CONFIG_FILE) -> dict:
+    with open(config_file) as f:
+        return yaml.safe_load(f)["data_generation"]
+
+
+def get_profile(name: str, config: dict) -> dict:
+    """Looks up a workload profile in config.yaml (`uniform` is always available)."""
+    profiles = config.get("profiles", {})
+    if name == "uniform" and name not in profiles:
+        return {}
+    if name not in profiles:
+        raise ValueError(f"Unknown workload profile '{name}'. Available: {sorted(profiles)}")
+    return profiles[name] or {}
+
+
+def scale_cardinalities(scale_factor: float, config: dict) -> dict:
+    """
+    TPC-style sizing: every table scales linearly from the config.yaml counts,
+    which define scale factor 1. The basket size range is chosen so the
+    average items per transaction matches transaction_item_count.
+    """
+    items_per_transaction = config["transaction_item_count"] / config["transaction_count"]
+    return {
+        "customers": max(1, round(config["customer_count"] * scale_factor)),
+        "products": max(1, round(config["product_count"] * scale_factor)),
+        "transactions": max(1, round(config["transaction_count"] * scale_factor)),
+        # Basket sizes are uniform on [1, max_items], so the mean is (1 + max_items) / 2
+        "max_items": max(1, round(2 * items_per_transaction - 1))
+    }
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_fingerprint(dataset_dir: str, params: dict) -> dict:
+    """
+    Content fingerprint of a generated dataset: one SHA-256 over the
+    generation parameters and the hash of every data file, in path order.
+    """
+    files = {}
+    for root, _, names in os.walk(dataset_dir):
+        for name in names:
+            if name.endswith((".csv", ".parquet")):
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, dataset_dir).replace(os.sep, "/")
+                files[rel_path] = {"bytes": os.path.getsize(path), "sha256": _file_sha256(path)}
+
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+    for rel_path in sorted(files):
+        digest.update(f"{rel_path}:{files[rel_path]['sha256']}".encode())
+
+    return {
+        "fingerprint": digest.hexdigest(),
+        "params": params,
+        "files": dict(sorted(files.items()))
+    }
+
+
+def build_benchmark_dataset(scale_factor: float, seed: int, output_dir: str = RAW_DIR,
+                            formats: Optional[list] = None, stream: bool = False, workers: int = 1,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE, as_of: Optional[date] = None,
+                            profile: str = "uniform", config: Optional[dict] = None) -> dict:
+    """
+    Builds (or reuses) the dataset for (scale_factor, seed) under the benchmark
+    cache, then copies it into `output_dir`. Returns the dataset fingerprint,
+    which is also written next to the data as dataset_fingerprint.json.
+    """
+    config = config or load_generation_config()
+    benchmark = config.get("benchmark", {})
+    formats = formats or ["csv"]
+    sizes = scale_cardinalities(scale_factor, config)
+    profile_spec = get_profile(profile, config)
+
+    params = {
+        "scale_factor": scale_factor,
+        "seed": int(seed),
+        "as_of": (as_of or date.fromisoformat(str(benchmark.get("as_of", date.today())))).isoformat(),
+        "formats": formats,
+        "stream": stream,
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "profile": profile,
+        "profile_spec": profile_spec,
+        **sizes
+    }
+    dataset_name = f"sf{scale_factor:g}_seed{seed}" + (f"_{profile}" if profile != "uniform" else "")
+    cache_dir = os.path.join(benchmark.get("cache_dir", "data/benchmarks"), dataset_name)
+    fingerprint_path = os.path.join(cache_dir, "dataset_fingerprint.json")
+
+    cached = None
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as f:
+            cached = json.load(f)
+
+    # Reuse only if the cached files still hash to what was recorded for them
+    if (cached is not None and cached["params"] == params
+            and dataset_fingerprint(cache_dir, params)["fingerprint"] == cached["fingerprint"]):
+        print(f"✓ Reusing cached benchmark dataset {cache_dir} ({cached['fingerprint'][:12]})")
+        fingerprint = cached
+    else:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        generate_dataset(
+            cache_dir, sizes["customers"], sizes["products"], sizes["transactions"],
+            seed=seed, as_of=date.fromisoformat(params["as_of"]), formats=formats, stream=stream,
+            workers=workers, chunk_size=chunk_size, max_items=sizes["max_items"], profile_spec=profile_spec
+        )
+        fingerprint = dataset_fingerprint(cache_dir, params)
+        with open(fingerprint_path, "w") as f:
+            json.dump(fingerprint, f, indent=4)
+
+    # Materialize the cached dataset as the pipeline's raw layer. Copies, not
+    # hard links: later writes to the raw files must not reach the cache.
+    os.makedirs(output_dir, exist_ok=True)
+    _remove_stale_outputs(output_dir, stream, formats)
+    for table in PARTITIONED_TABLES:
+        shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+    for rel_path in list(fingerprint["files"]) + ["generation_metadata.json", "dataset_fingerprint.json"]:
+        dst = os.path.join(output_dir, rel_path)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(os.path.join(cache_dir, rel_path), dst)
+
+    return fingerprint
+
+
+# ----------------------------
+# MAIN EXECUTION
+# ----------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic e-commerce data")
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--transactions", type=int, default=300)
+    parser.add_argument("--scale-factor", type=float, default=None,
+                        help="derive all table sizes from config.yaml (SF 1) and cache the dataset")
+    parser.add_argument("--profile", default="uniform",
+                        help="workload distribution profile from config.yaml (e.g. skewed)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write transactions/items in chunks to month-partitioned files")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="generate transaction shards in N processes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible output (random if omitted)")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="anchor date for generated dates (default: today)")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="csv",
+                        help="raw file format; parquet needs pyarrow")
+    parser.add_argument("--validate", action="store_true",
+                        help="stream the written files through the referential integrity validator")
+    parser.add_argument("--validate-only", action="store_true",
+                        help="only validate the existing dataset in --output-dir")
+    parser.add_argument("--output-dir", default=RAW_DIR)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    formats = OUTPUT_FORMATS[args.format]
+    config = load_generation_config()
+
+    if args.validate_only:
+        report = validate_referential_integrity_streaming(args.output_dir)
+        print(json.dumps(report, indent=4))
+        if not all(r["valid"] for r in report["relationships"].values()):
+            raise SystemExit("❌ Referential integrity violations found")
+        print("✅ Referential integrity validated")
+        return
+
+    if args.scale_factor is not None:
+        seed = args.seed if args.seed is not None else config.get("benchmark", {}).get("seed", 0)
+        fingerprint = build_benchmark_dataset(
+            args.scale_factor, seed, output_dir=args.output_dir, formats=formats,
+            stream=args.stream, workers=args.workers, chunk_size=args.chunk_size, as_of=args.as_of,
+            profile=args.profile, config=config
+        )
+        print(f"✅ Benchmark dataset SF {args.scale_factor:g} ready (fingerprint {fingerprint['fingerprint']})")
+        return
+
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    generate_dataset(
+        args.output_dir, args.customers, args.products, args.transactions,
+        seed=seed, as_of=args.as_of or date.today(), formats=formats, stream=args.stream,
+        workers=args.workers, chunk_size=args.chunk_size, profile_spec=get_profile(args.profile, config),
+        validate=args.validate
+    )
+
     print("✅ Data generation completed successfully")
+
+
+if __name__ == "__main__":
+    main()
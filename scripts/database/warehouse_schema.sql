@@ -21,6 +21,7 @@ CREATE TABLE IF NOT EXISTS warehouse.dim_customers (
     first_name VARCHAR(50),
     last_name VARCHAR(50),
     email VARCHAR(100),
+    row_hash CHAR(32), -- md5 of the tracked columns (see load_warehouse.SCD2_DIMENSIONS)
     is_current BOOLEAN DEFAULT TRUE,
     effective_date DATE DEFAULT CURRENT_DATE, -- Naming as per
     end_date DATE
@@ -34,22 +35,48 @@ CREATE TABLE IF NOT EXISTS warehouse.dim_products (
     category VARCHAR(50),
     price NUMERIC(12,2),
     cost NUMERIC(12,2),
+    row_hash CHAR(32), -- md5 of the tracked columns (see load_warehouse.SCD2_DIMENSIONS)
     is_current BOOLEAN DEFAULT TRUE,
     effective_date DATE DEFAULT CURRENT_DATE,
     end_date DATE
 );
 
+-- Current-version lookups (see load_warehouse.WAREHOUSE_INDEXES): change
+-- detection compares row_hash, fact loads resolve surrogate keys (and cost)
+CREATE INDEX IF NOT EXISTS idx_dim_customers_current_hash
+    ON warehouse.dim_customers (customer_id, row_hash) WHERE is_current;
+CREATE INDEX IF NOT EXISTS idx_dim_customers_current_key
+    ON warehouse.dim_customers (customer_id) INCLUDE (dw_customer_id) WHERE is_current;
+CREATE INDEX IF NOT EXISTS idx_dim_products_current_hash
+    ON warehouse.dim_products (product_id, row_hash) WHERE is_current;
+CREATE INDEX IF NOT EXISTS idx_dim_products_current_key
+    ON warehouse.dim_products (product_id) INCLUDE (dw_product_id, cost) WHERE is_current;
+
 -- 4. Sales Fact Table (Grain: transaction_items)
+-- Range-partitioned by month on transaction_date; load_warehouse.py creates the
+-- monthly partitions (fact_sales_pYYYYMM) ahead of incoming data
 CREATE TABLE IF NOT EXISTS warehouse.fact_sales (
-    fact_sales_id SERIAL PRIMARY KEY,
+    fact_sales_id SERIAL,
     dw_customer_id INT REFERENCES warehouse.dim_customers(dw_customer_id),
     dw_product_id INT REFERENCES warehouse.dim_products(dw_product_id),
     transaction_id VARCHAR(20),
-    transaction_date DATE REFERENCES warehouse.dim_date(date_key),
+    transaction_date DATE NOT NULL REFERENCES warehouse.dim_date(date_key),
     quantity INT,
     line_total NUMERIC(12,2),
-    profit NUMERIC(12,2)
-);
+    profit NUMERIC(12,2),
+    PRIMARY KEY (fact_sales_id, transaction_date)
+) PARTITION BY RANGE (transaction_date);
+
+-- Incremental fact loads anti-join on transaction_id; aggregate maintenance
+-- recomputes per date, customer and product. Full rebuilds drop these and
+-- recreate them after the load.
+CREATE INDEX IF NOT EXISTS idx_fact_sales_transaction_id ON warehouse.fact_sales (transaction_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_transaction_date
+    ON warehouse.fact_sales (transaction_date) INCLUDE (transaction_id, dw_customer_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_dw_customer_id
+    ON warehouse.fact_sales (dw_customer_id) INCLUDE (transaction_id, transaction_date, line_total);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_dw_product_id
+    ON warehouse.fact_sales (dw_product_id) INCLUDE (quantity, line_total, profit);
 
 -- 5. Required Aggregate Tables
 
@@ -76,4 +103,12 @@ CREATE TABLE IF NOT EXISTS warehouse.agg_customer_metrics (
     total_spend NUMERIC(12,2),
     total_orders INT,
     last_order_date DATE
-);
\ No newline at end of file
+);
+
+-- 6. Load log: one row per committed load_warehouse run; the latest load_id
+-- is the data version analytics results are cached against
+CREATE TABLE IF NOT EXISTS warehouse.etl_loads (
+    load_id SERIAL PRIMARY KEY,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fact_mode VARCHAR(20)
+);
@@ -0,0 +1,199 @@
+"""
+Shared database access for every pipeline stage and the tests.
+
+One pooled SQLAlchemy engine per process, so when the orchestrator runs all
+steps in one interpreter they reuse the same connections instead of each
+building its own pool. Settings come from config.yaml (database section),
+overridden by the DB_* environment variables. Connections are pre-pinged on
+checkout and carry a server-side statement_timeout. Pool usage is recorded
+per stage: wrap a stage in `with stage("name"):` and read it back with
+connection_metrics().
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import yaml
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.path.join(BASE_DIR, "config", "config.yaml")
+
+# Fallbacks match the docker-compose Postgres service
+DEFAULT_SETTINGS = {
+    "host": "localhost",
+    "port": 5433,
+    "db_name": "ecommerce_db",
+    "user": "admin",
+    "password": "password",
+    "pool_size": 5,
+    "max_overflow": 5,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "statement_timeout_ms": 600000
+}
+
+ENV_OVERRIDES = {
+    "host": "DB_HOST",
+    "port": "DB_PORT",
+    "db_name": "DB_NAME",
+    "user": "DB_USER",
+    "password": "DB_PASSWORD",
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "statement_timeout_ms": "DB_STATEMENT_TIMEOUT_MS"
+}
+
+INT_SETTINGS = {"port", "pool_size", "max_overflow", "pool_timeout", "pool_recycle", "statement_timeout_ms"}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# ----------------------------
+# Settings
+# ----------------------------
+def db_settings(config_file=CONFIG_FILE, environ=None):
+    """Defaults, then config.yaml's database section, then DB_* variables."""
+    environ = os.environ if environ is None else environ
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(config_file):
+        with open(config_file) as f:
+            settings.update((yaml.safe_load(f) or {}).get("database") or {})
+    for key, var in ENV_OVERRIDES.items():
+        if environ.get(var):
+            settings[key] = environ[var]
+    for key in INT_SETTINGS:
+        settings[key] = int(settings[key])
+    return settings
+
+def database_url(settings=None):
+    settings = settings or db_settings()
+    return URL.create(
+        "postgresql+psycopg2",
+        username=settings["user"],
+        password=settings["password"],
+        host=settings["host"],
+        port=settings["port"],
+        database=settings["db_name"]
+    )
+
+# ----------------------------
+# Per-stage connection metrics
+# ----------------------------
+_metrics_lock = threading.Lock()
+_current_stage = "default"
+_stage_metrics = {}
+
+def _new_metrics():
+    return {
+        "checkouts": 0,
+        "connections_opened": 0,
+        "in_use": 0,
+        "peak_in_use": 0,
+        "busy_seconds": 0.0
+    }
+
+def set_stage(name):
+    """Attributes subsequent pool activity (from any thread) to a stage; returns the previous one."""
+    global _current_stage
+    previous, _current_stage = _current_stage, name
+    return previous
+
+@contextmanager
+def stage(name):
+    previous = set_stage(name)
+    try:
+        yield
+    finally:
+        set_stage(previous)
+
+def _stage_entry(name):
+    return _stage_metrics.setdefault(name, _new_metrics())
+
+def _on_connect(dbapi_connection, connection_record):
+    with _metrics_lock:
+        _stage_entry(_current_stage)["connections_opened"] += 1
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _metrics_lock:
+        entry = _stage_entry(_current_stage)
+        entry["checkouts"] += 1
+        entry["in_use"] += 1
+        entry["peak_in_use"] = max(entry["peak_in_use"], entry["in_use"])
+    connection_record.info["checkout"] = (_current_stage, time.perf_counter())
+
+def _on_checkin(dbapi_connection, connection_record):
+    checkout = connection_record.info.pop("checkout", None)
+    if checkout is None:
+        return
+    name, started = checkout
+    with _metrics_lock:
+        entry = _stage_entry(name)
+        entry["in_use"] -= 1
+        entry["busy_seconds"] += time.perf_counter() - started
+
+def instrument(engine):
+    """Attaches the per-stage usage listeners to an engine's pool."""
+    event.listen(engine, "connect", _on_connect)
+    event.listen(engine, "checkout", _on_checkout)
+    event.listen(engine, "checkin", _on_checkin)
+    return engine
+
+def connection_metrics(name=None):
+    """Usage of the shared pool, for one stage or for all of them."""
+    with _metrics_lock:
+        snapshot = {
+            stage_name: {**entry, "busy_seconds": round(entry["busy_seconds"], 3)}
+            for stage_name, entry in _stage_metrics.items()
+        }
+    if name is not None:
+        return snapshot.get(name, _new_metrics())
+    return snapshot
+
+def reset_metrics():
+    with _metrics_lock:
+        _stage_metrics.clear()
+
+# ----------------------------
+# Engine and connections
+# ----------------------------
+def get_engine():
+    """The process-wide pooled engine, created on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            settings = db_settings()
+            connect_args = {}
+            if settings["statement_timeout_ms"]:
+                connect_args["options"] = f"-c statement_timeout={settings['statement_timeout_ms']}"
+            _engine = instrument(create_engine(
+                database_url(settings),
+                pool_size=settings["pool_size"],
+                max_overflow=settings["max_overflow"],
+                pool_timeout=settings["pool_timeout"],
+                pool_recycle=settings["pool_recycle"],
+                pool_pre_ping=True,
+                connect_args=connect_args
+            ))
+        return _engine
+
+def raw_connection():
+    """
+    A DBAPI (psycopg2) connection checked out of the shared pool, for code
+    that works with cursors directly. close() returns it to the pool.
+    """
+    return get_engine().raw_connection()
+
+def dispose_engine():
+    """Closes every pooled connection; the next get_engine() builds a new pool."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
@@ -1,66 +1,434 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import os
+import sys
+import io
+import csv
+import glob
+import hashlib
+import argparse
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv
 
-load_dotenv()
+# Make the repo root importable when this file is run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+# Functional Requirement 2: connection settings come from DB_* environment variables
+from scripts.db import get_engine, stage, connection_metrics, db_settings
 
-# Functional Requirement 2: Use environment variables
-DB_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+# Typed columnar files are preferred over CSV when the generator wrote both
+SOURCE_FORMATS = ["parquet", "csv"]
 
-def ingest_all_data():
-    engine = create_engine(DB_URL)
+# Rows per COPY batch when a file has to be re-encoded (Parquet, projected CSV)
+COPY_BATCH_ROWS = 100_000
+
+# Each table is loaded into staging.<table>__shadow and swapped in by rename
+SHADOW_SUFFIX = "__shadow"
+OLD_SUFFIX = "__old"
+# Upper bound on waiting for readers to release the live tables at swap time
+SWAP_LOCK_TIMEOUT = "10s"
+
+# Fingerprints of the files behind each staging table as of the last load
+MANIFEST_FILE = "data/staging/ingestion_manifest.json"
+# Tables whose sources only ever grow, so new rows can be appended in place
+APPEND_ONLY_TABLES = {"transactions", "transaction_items"}
+HASH_BLOCK_SIZE = 1 << 20
+
+def resolve_source_files(path):
+    """
+    Returns the files backing a dataset: the flat file if present, otherwise the
+    month partitions written by the streaming generator (data/raw/<table>/*),
+    trying Parquet before CSV.
+    """
+    stem = os.path.splitext(path)[0]
+    for fmt in SOURCE_FORMATS:
+        if os.path.exists(f"{stem}.{fmt}"):
+            return [f"{stem}.{fmt}"]
+        partitions = sorted(glob.glob(os.path.join(stem, f"*.{fmt}")))
+        if partitions:
+            return partitions
+    return []
+
+def staging_columns(conn, table):
+    """Columns of staging.<table>, used to project source files on read."""
+    rows = conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = 'staging' AND table_name = :t"
+    ), {"t": table}).fetchall()
+    return {r[0] for r in rows}
+
+class CountingReader:
+    """File wrapper that counts the bytes COPY pulls through it."""
+
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self._f.readline(size)
+        self.bytes_read += len(data)
+        return data
+
+def _copy_csv_stream(cursor, table, columns, stream, header=True):
+    """COPY staging.<table> (columns) FROM STDIN for a CSV stream."""
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor.copy_expert(
+        f"COPY staging.{table} ({column_list}) FROM STDIN "
+        f"WITH (FORMAT csv, HEADER {'true' if header else 'false'})",
+        stream
+    )
+    return cursor.rowcount
+
+def _copy_batches(cursor, table, batches):
+    """COPYs DataFrame batches, re-encoded to CSV one batch at a time."""
+    rows = 0
+    for df in batches:
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False)
+        buffer.seek(0)
+        rows += _copy_csv_stream(cursor, table, list(df.columns), buffer)
+    return rows
+
+def copy_file(cursor, table, path, columns, offset=0):
+    """
+    Bulk loads one source file with COPY and returns (rows, bytes_read).
+
+    A CSV whose header only names staging columns is streamed byte for byte
+    into COPY without being parsed in Python. Parquet (and CSVs carrying extra
+    columns) are projected onto the staging columns and re-encoded to CSV in
+    COPY_BATCH_ROWS batches, so no file is ever fully materialized.
+
+    A non-zero offset loads only the rows after that byte position of a CSV,
+    i.e. the tail appended to it since the last load.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        projected = [c for c in parquet_file.schema_arrow.names if c in columns]
+        batches = (
+            batch.to_pandas()
+            for batch in parquet_file.iter_batches(batch_size=COPY_BATCH_ROWS, columns=projected)
+        )
+        return _copy_batches(cursor, table, batches), os.path.getsize(path)
+
+    with open(path, newline="") as f:
+        header = next(csv.reader(f))
+    if set(header) <= columns:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            stream = CountingReader(f)
+            rows = _copy_csv_stream(cursor, table, header, stream, header=not offset)
+        return rows, stream.bytes_read
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        batches = pd.read_csv(f, names=header, header=None if offset else 0,
+                              usecols=lambda c: c in columns, dtype=str, keep_default_na=False,
+                              chunksize=COPY_BATCH_ROWS)
+        return _copy_batches(cursor, table, batches), os.path.getsize(path) - offset
+
+# ----------------------------
+# Change detection
+# ----------------------------
+def load_manifest(path=MANIFEST_FILE):
+    """The manifest written by the last successful load, or {} on first run."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+def file_hashes(path, prefix_size=None):
+    """
+    sha256 of the whole file and, when prefix_size is given, of its first
+    prefix_size bytes, computed in a single read. The prefix hash is None when
+    the file is shorter than prefix_size.
+    """
+    digest = hashlib.sha256()
+    prefix = None
+    position = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            if prefix_size is not None and prefix is None and position + len(block) >= prefix_size:
+                cut = prefix_size - position
+                digest.update(block[:cut])
+                prefix = digest.copy().hexdigest()
+                digest.update(block[cut:])
+            else:
+                digest.update(block)
+            position += len(block)
+    return digest.hexdigest(), prefix
+
+def describe_file(path, previous=None):
+    """
+    Returns (entry, prefix_sha256) for a source file. Hashing is skipped when
+    size and mtime match the previous entry; when the file grew, the hash of
+    its previous length is returned so an append can be told from a rewrite.
+    """
+    stat = os.stat(path)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+        entry["sha256"] = previous["sha256"]
+        return entry, None
+
+    prefix_size = previous["size"] if previous and previous["size"] < stat.st_size else None
+    entry["sha256"], prefix = file_hashes(path, prefix_size)
+    return entry, prefix
+
+def _ends_line_at(path, offset):
+    """True when the byte before offset is a newline, i.e. offset starts a row."""
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+def plan_table_load(table, files, previous, full_refresh=False):
+    """
+    Decides how to bring staging.<table> up to date with its source files.
+
+    Returns (mode, parts, entries): mode is "skipped" when no file changed,
+    "append" when an append-only table only gained partitions or rows, and
+    "full" otherwise. parts lists the (path, byte_offset) pieces to COPY and
+    entries the new manifest entries (without row counts).
+    """
+    previous_files = (previous or {}).get("files", {})
+    entries, appended = {}, []
+    rewritten = bool(set(previous_files) - set(files))
+    for path in files:
+        old = previous_files.get(path)
+        entries[path], prefix = describe_file(path, old)
+        if old is None:
+            appended.append((path, 0))
+        elif entries[path]["sha256"] == old["sha256"]:
+            continue
+        elif prefix == old["sha256"] and path.endswith(".csv") and _ends_line_at(path, old["size"]):
+            appended.append((path, old["size"]))
+        else:
+            rewritten = True
+
+    if full_refresh or not previous_files or rewritten:
+        return "full", [(path, 0) for path in files], entries
+    if not appended:
+        return "skipped", [], entries
+    if table in APPEND_ONLY_TABLES:
+        return "append", appended, entries
+    return "full", [(path, 0) for path in files], entries
+
+def staging_row_count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM staging.{table}")).scalar()
+
+def staging_storage_ids(engine, tables):
+    """
+    relfilenode of each staging table: a swap, TRUNCATE or re-created table
+    gets a new one, so it tells whether the table is still the one the
+    manifest describes without scanning it.
+    """
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT relname, relfilenode FROM pg_class "
+            "WHERE relnamespace = 'staging'::regnamespace AND relname = ANY(:tables)"
+        ), {"tables": list(tables)}).fetchall())
+
+def manifest_is_stale(engine, table, previous, storage_ids):
+    """
+    True when staging.<table> no longer holds what its manifest entry
+    describes. Entries written before storage ids were recorded fall back to
+    comparing the row count.
+    """
+    if "relfilenode" in previous:
+        return previous["relfilenode"] != storage_ids.get(table)
+    return staging_row_count(engine, table) != previous["rows"]
+
+def load_shadow_table(engine, table, parts):
+    """
+    Loads one table into a fresh staging.<table>__shadow on its own pooled
+    connection. The live table is only read for its definition, so readers
+    are never blocked while the data is copied. parts is a list of
+    (path, byte_offset) pieces, as returned by plan_table_load.
+    """
+    shadow = f"{table}{SHADOW_SUFFIX}"
+    start = time.perf_counter()
+    file_rows = {}
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS staging.{shadow};"))
+        conn.execute(text(f"CREATE TABLE staging.{shadow} (LIKE staging.{table} INCLUDING ALL);"))
+        columns = staging_columns(conn, table)
+        cursor = conn.connection.cursor()
+
+        rows_loaded = bytes_read = 0
+        # Bulk Loading: PostgreSQL COPY, one source file at a time
+        for file, offset in parts:
+            rows, nbytes = copy_file(cursor, shadow, file, columns, offset)
+            file_rows[file] = rows
+            rows_loaded += rows
+            bytes_read += nbytes
+    duration = time.perf_counter() - start
+
+    return {
+        "rows_loaded": rows_loaded,
+        "files_loaded": len(parts),
+        "source_format": os.path.splitext(parts[0][0])[1].lstrip("."),
+        "load_method": "copy",
+        "bytes_read": bytes_read,
+        "duration_seconds": round(duration, 3),
+        "rows_per_sec": round(rows_loaded / duration, 1) if duration else None,
+        "bytes_per_sec": round(bytes_read / duration, 1) if duration else None,
+        "status": "success"
+    }, file_rows
+
+def index_names(conn, table):
+    """
+    Index definition (with its own and its table's name stripped) -> index
+    name, for every index on staging.<table>.
+    """
+    rows = conn.execute(text("""
+        SELECT regexp_replace(indexdef, ' INDEX \\S+ ON \\S+ ', ' INDEX ON '), indexname
+        FROM pg_indexes WHERE schemaname = 'staging' AND tablename = :t
+    """), {"t": table}).fetchall()
+    return dict(rows)
+
+def swap_shadow_tables(engine, replaced, appended=()):
+    """
+    Publishes every shadow table in one short transaction. Fully reloaded
+    tables are swapped by rename (live -> __old, shadow -> live, drop __old);
+    for appended tables the shadow holds only the new rows, which are inserted
+    into the live table. Readers see either the previous or the new staging
+    data, never a mix. Returns how long the transaction held its locks.
+
+    LIKE ... INCLUDING ALL names the shadow's indexes after the shadow table,
+    so once the old table is gone they are renamed back to the live names;
+    the DDL's CREATE INDEX IF NOT EXISTS would otherwise build duplicates.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';"))
+        start = time.perf_counter()
+        for table in replaced:
+            live_names = index_names(conn, table)
+            conn.execute(text(f"ALTER TABLE staging.{table} RENAME TO {table}{OLD_SUFFIX};"))
+            conn.execute(text(f"ALTER TABLE staging.{table}{SHADOW_SUFFIX} RENAME TO {table};"))
+            conn.execute(text(f"DROP TABLE staging.{table}{OLD_SUFFIX};"))
+            for definition, name in index_names(conn, table).items():
+                if live_names.get(definition, name) != name:
+                    conn.execute(text(f'ALTER INDEX staging."{name}" RENAME TO "{live_names[definition]}";'))
+        for table in appended:
+            conn.execute(text(f"INSERT INTO staging.{table} SELECT * FROM staging.{table}{SHADOW_SUFFIX};"))
+            conn.execute(text(f"DROP TABLE staging.{table}{SHADOW_SUFFIX};"))
+    return time.perf_counter() - start
+
+def drop_shadow_tables(engine, tables):
+    """Removes leftover shadow tables after a failed load."""
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(f"DROP TABLE IF EXISTS staging.{table}{SHADOW_SUFFIX};"))
+
+def ingest_all_data(full_refresh=False):
     summary = {"ingestion_timestamp": datetime.now().isoformat(), "tables_loaded": {}}
     
-    # Functional Requirement 1: Source all 4 CSVs
+    # Functional Requirement 1: Source all 4 datasets (CSV or Parquet)
     datasets = {
         "customers": "data/raw/customers.csv",
         "products": "data/raw/products.csv",
         "transactions": "data/raw/transactions.csv",
         "transaction_items": "data/raw/transaction_items.csv"
     }
+    engine = get_engine()
+    settings = db_settings()
+    # One pooled connection per concurrently loading table, within the pool's capacity
+    workers = max(1, min(len(datasets), settings["pool_size"] + settings["max_overflow"]))
+    manifest = load_manifest()
 
-    try:
-        # Transaction Atomicity: Start a single transaction for all tables
-        with engine.begin() as conn:
+    # Connection Usage: pool activity below is attributed to the ingestion stage
+    with stage("ingestion"):
+        try:
+            # Change Detection: decide per table whether to skip, append or reload
+            plans = {}
+            storage_ids = staging_storage_ids(engine, datasets)
             for table, path in datasets.items():
-                # Error Handling: Graceful handling of missing files
-                if not os.path.exists(path):
+                files = resolve_source_files(path)
+                # Error Handling: Graceful handling of missing files, before anything is loaded
+                if not files:
                     raise FileNotFoundError(f"Missing mandatory file: {path}")
-                
-                df = pd.read_csv(path)
-                
-                # Loading Strategy: Truncate before loading (Idempotency)
-                conn.execute(text(f"TRUNCATE TABLE staging.{table} CASCADE;"))
-                
-                # Bulk Loading: Use 'multi' method for performance (>100 rows/sec)
-                df.to_sql(
-                    name=table, 
-                    con=conn, 
-                    schema='staging', 
-                    if_exists='append', 
-                    index=False, 
-                    method='multi', 
-                    chunksize=1000 # Performance Optimization
-                )
-                
-                summary["tables_loaded"][f"staging.{table}"] = {
-                    "rows_loaded": len(df),
-                    "status": "success"
+                previous = manifest.get(table)
+                # The manifest only vouches for the table it was written for
+                stale = previous is not None and manifest_is_stale(engine, table, previous, storage_ids)
+                plans[table] = plan_table_load(table, files, previous, full_refresh or stale)
+
+            # Parallel Loading: each changed table COPYs into its own shadow table
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    table: pool.submit(load_shadow_table, engine, table, parts)
+                    for table, (mode, parts, _) in plans.items() if mode != "skipped"
                 }
-                print(f"✓ Ingested {len(df)} rows into staging.{table}")
+                results = {table: future.result() for table, future in futures.items()}
+            load_seconds = time.perf_counter() - start
+
+            # Transaction Atomicity: all changed tables are published in one swap
+            replaced = [t for t in results if plans[t][0] == "full"]
+            appended = [t for t in results if plans[t][0] == "append"]
+            lock_seconds = swap_shadow_tables(engine, replaced, appended) if results else 0.0
 
-        # Summary Report: Generate the mandatory JSON file
-        with open('data/staging/ingestion_summary.json', 'w') as f:
-            json.dump(summary, f, indent=4)
+            new_manifest = {}
+            storage_ids = staging_storage_ids(engine, datasets)
+            for table, (mode, parts, entries) in plans.items():
+                file_rows = results[table][1] if table in results else {}
+                previous_files = manifest.get(table, {}).get("files", {})
+                for path, entry in entries.items():
+                    # Appended files keep the rows already loaded before their tail
+                    carried = previous_files[path]["rows"] if mode != "full" and path in previous_files else 0
+                    entry["rows"] = carried + file_rows.get(path, 0)
+                new_manifest[table] = {"files": entries, "rows": sum(e["rows"] for e in entries.values()),
+                                       "relfilenode": storage_ids.get(table)}
+
+                if table in results:
+                    stats = results[table][0]
+                else:
+                    stats = {"rows_loaded": 0, "files_loaded": 0, "status": "success"}
+                stats = {"mode": mode, **stats, "rows_total": new_manifest[table]["rows"]}
+                summary["tables_loaded"][f"staging.{table}"] = stats
+                if mode == "skipped":
+                    print(f"✓ staging.{table} unchanged, skipped ({stats['rows_total']} rows)")
+                else:
+                    print(f"✓ Ingested {stats['rows_loaded']} rows into staging.{table} "
+                          f"[{mode}] ({stats['rows_per_sec']} rows/sec)")
+            summary["load_wall_clock_seconds"] = round(load_seconds, 3)
+            summary["load_sum_table_seconds"] = round(
+                sum(stats["duration_seconds"] for stats, _ in results.values()), 3)
+            summary["swap_lock_hold_seconds"] = round(lock_seconds, 4)
+            if results:
+                print(f"✓ Published staging tables (locks held {lock_seconds * 1000:.1f} ms)")
+
+            summary["connection_usage"] = connection_metrics("ingestion")
+
+            # The manifest only advances once the swap has committed
+            save_manifest(new_manifest)
+
+            # Summary Report: Generate the mandatory JSON file
+            with open('data/staging/ingestion_summary.json', 'w') as f:
+                json.dump(summary, f, indent=4)
             
-    except Exception as e:
-        # Transaction Atomicity: Rollback happens automatically here if any table fails
-        print(f"CRITICAL ERROR: {e}. No data was loaded.")
-        raise
+        except Exception as e:
+            # Transaction Atomicity: live tables are untouched until the swap commits
+            drop_shadow_tables(engine, list(datasets))
+            print(f"CRITICAL ERROR: {e}. No data was loaded.")
+            raise
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load raw datasets into the staging schema")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Ignore the ingestion manifest and reload every table")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    args = parse_args()
     os.makedirs('data/staging', exist_ok=True)
-    ingest_all_data()
\ No newline at end of file
+    ingest_all_data(full_refresh=args.full_refresh)
\ No newline at end of file
@@ -1,19 +1,15 @@
 import json
-import psycopg2
 import os
+import sys
 from datetime import datetime
 from decimal import Decimal   # ✅ FIX 1
 
 # =========================================================
-# DATABASE CONFIG
+# DATABASE CONNECTION (shared pool, see scripts/db.py)
 # =========================================================
-DB_CONFIG = {
-    "host": "localhost",
-    "port": 5433,
-    "dbname": "ecommerce_db",
-    "user": "admin",
-    "password": "password"   # must match docker POSTGRES_PASSWORD
-}
+# Make the repo root importable when this file is run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from scripts.db import raw_connection, set_stage
 
 # =========================================================
 # SAFE ABSOLUTE PATH FOR REPORT
@@ -56,7 +52,8 @@ def main():
     now_iso = now.isoformat()
 
     # ---------------- CONNECT ----------------
-    conn = psycopg2.connect(**DB_CONFIG)
+    set_stage("monitoring")
+    conn = raw_connection()
     cur = conn.cursor()
 
     # =====================================================
@@ -1,14 +1,16 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import json
 import os
+import sys
 from datetime import datetime
-from dotenv import load_dotenv
 
-load_dotenv()
+# Make the repo root importable when this file is run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from scripts.db import get_engine, stage, connection_metrics
 
 def run_quality_checks():
-    engine = create_engine(f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
+    engine = get_engine()
     
     # Standardized Report Schema
     report = {
@@ -18,7 +20,7 @@ def run_quality_checks():
         "quality_grade": ""
     }
 
-    with engine.connect() as conn:
+    with stage("quality_checks"), engine.connect() as conn:
         # Example: Referential Integrity Check
         orphan_sql = "SELECT count(*) FROM staging.transactions t LEFT JOIN staging.customers c ON t.customer_id = c.customer_id WHERE c.customer_id IS NULL"
         orphan_count = conn.execute(text(orphan_sql)).scalar()
@@ -33,6 +35,7 @@ def run_quality_checks():
     # For now, let's assume a perfect score if orphan_count is 0
     report["overall_quality_score"] = 100 if orphan_count == 0 else 70
     report["quality_grade"] = "A" if report["overall_quality_score"] >= 90 else "C"
+    report["connection_usage"] = connection_metrics("quality_checks")
 
     # Save to mandatory location
     os.makedirs('data/quality_reports', exist_ok=True)
@@ -0,0 +1,106 @@
+"""
+Declared column types for every table the pipeline moves between layers.
+
+Stages load DataFrames through iter_sql_typed / apply_schema instead of
+letting pandas infer types: IDs become compact strings, low-cardinality labels
+become categoricals, numerics get a fixed width (nullable integers, so a NULL
+never silently widens a column to float) and dates are parsed once.
+Columns a table does not have in a given layer are simply ignored.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+try:
+    import pyarrow  # noqa: F401
+    # Arrow-backed strings are stored contiguously instead of as Python objects
+    STRING = "string[pyarrow]"
+except ImportError:
+    STRING = "string"
+
+LABEL = "category"
+DATE = "date"
+DATETIME = "datetime"
+
+TABLE_SCHEMAS = {
+    "customers": {
+        "customer_id": STRING,
+        "name": STRING,
+        "first_name": STRING,
+        "last_name": STRING,
+        "email": STRING,
+        "phone": STRING,
+        "address": STRING,
+        "city": STRING,
+        "state": LABEL,
+        "country": LABEL,
+        "signup_date": DATE,
+        "created_at": DATETIME,
+        "updated_at": DATETIME,
+        "loaded_at": DATETIME
+    },
+    "products": {
+        "product_id": STRING,
+        "product_name": STRING,
+        "category": LABEL,
+        "sub_category": LABEL,
+        "brand": LABEL,
+        "supplier_id": LABEL,
+        "price": "float64",
+        "cost": "float64",
+        "stock_quantity": "Int32",
+        "profit_margin": "float64",
+        "price_category": LABEL,
+        "created_at": DATETIME,
+        "updated_at": DATETIME,
+        "loaded_at": DATETIME
+    },
+    "transactions": {
+        "transaction_id": STRING,
+        "customer_id": LABEL,
+        "transaction_date": DATE,
+        "transaction_time": STRING,
+        "payment_method": LABEL,
+        "shipping_address": STRING,
+        "total_amount": "float64",
+        "created_at": DATETIME,
+        "loaded_at": DATETIME
+    },
+    "transaction_items": {
+        "item_id": "Int64",
+        "transaction_id": STRING,
+        "product_id": LABEL,
+        "quantity": "Int16",
+        "price_at_time": "float64",
+        "line_total": "float64",
+        "loaded_at": DATETIME
+    }
+}
+
+def schema_for(table, columns=None):
+    """Declared types of a table, restricted to the given columns if any."""
+    schema = TABLE_SCHEMAS[table]
+    if columns is None:
+        return dict(schema)
+    return {c: schema[c] for c in columns if c in schema}
+
+def apply_schema(df, table):
+    """Casts the declared columns of df in place and returns it."""
+    for column, dtype in schema_for(table, df.columns).items():
+        if dtype in (DATE, DATETIME):
+            df[column] = pd.to_datetime(df[column])
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+def iter_sql_typed(sql, conn, table, batch_size, **kwargs):
+    """
+    Streams a query through a server-side (named) cursor and yields typed
+    DataFrames of at most batch_size rows, so only one batch is ever in memory.
+    """
+    query = text(sql).execution_options(stream_results=True, max_row_buffer=batch_size)
+    for df in pd.read_sql(query, conn, chunksize=batch_size, **kwargs):
+        yield apply_schema(df, table)
+
+def memory_footprint(df):
+    """Deep in-memory size of a DataFrame in bytes."""
+    return int(df.memory_usage(deep=True).sum())
@@ -1,12 +1,34 @@
 import pandas as pd
-from sqlalchemy import create_engine
+import argparse
+import hashlib
 import os
+import re
+import sys
 import json
 import time
+import yaml
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from dotenv import load_dotenv
 
-load_dotenv()
+# Make the repo root importable when this file is run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from sqlalchemy import text
+from scripts.db import CONFIG_FILE, get_engine, stage, connection_metrics, db_settings
+
+CACHE_DEFAULTS = {"dir": "data/cache/analytics", "max_mb": 256, "max_age_hours": 168}
+
+def _pipeline_config():
+    with open(CONFIG_FILE) as f:
+        return yaml.safe_load(f).get("pipeline") or {}
+
+def default_parallelism():
+    """
+    Concurrent analytics queries (pipeline.analytics_workers in config.yaml),
+    capped at what the shared connection pool can hand out at once.
+    """
+    workers = int(_pipeline_config().get("analytics_workers", 4))
+    settings = db_settings()
+    return max(1, min(workers, settings["pool_size"] + settings["max_overflow"]))
 
 # Function 1: Execute Query
 def execute_query(engine, query_name, sql):
@@ -17,6 +39,124 @@ def execute_query(engine, query_name, sql):
     execution_time_ms = round((end_time - start_time) * 1000, 2)
     return df, execution_time_ms
 
+# ----------------------------
+# Result cache
+# ----------------------------
+# Results are pickled under <data version>-<query hash>.pkl. The data version
+# is the last warehouse load id (warehouse.etl_loads, written by
+# load_warehouse), so any load makes every older entry unreachable.
+# Nothing versions the other schemas, so queries reading them always run.
+UNVERSIONED_SCHEMAS = re.compile(r"\b(production|staging)\.", re.IGNORECASE)
+
+def cache_settings():
+    settings = dict(CACHE_DEFAULTS)
+    settings.update(_pipeline_config().get("analytics_cache") or {})
+    return settings
+
+def warehouse_version(engine):
+    """Id of the last committed warehouse load; None if loads are not recorded yet."""
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT to_regclass('warehouse.etl_loads')")).scalar():
+            return None
+        return conn.execute(text("SELECT COALESCE(MAX(load_id), 0) FROM warehouse.etl_loads")).scalar()
+
+def is_cacheable(sql):
+    """True when sql reads only warehouse tables, whose changes bump the data version."""
+    return not UNVERSIONED_SCHEMAS.search(sql)
+
+def cache_key(sql, version):
+    return f"{version}-{hashlib.sha256(sql.encode()).hexdigest()[:32]}"
+
+def cache_get(cache_dir, key):
+    path = os.path.join(cache_dir, f"{key}.pkl")
+    try:
+        df = pd.read_pickle(path)
+    except FileNotFoundError:
+        return None
+    os.utime(path)  # recently used entries survive size eviction longest
+    return df
+
+def cache_put(cache_dir, key, df):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.pkl")
+    # Written aside and renamed, so a concurrent reader never sees half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+def evict_cache(cache_dir, version, max_bytes, max_age_seconds, now=None):
+    """
+    Removes entries of other data versions and entries unused for longer
+    than max_age_seconds, then the least recently used ones until the cache
+    fits in max_bytes. Returns the number of entries removed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    now = now or time.time()
+    entries, removed = [], 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        if not name.startswith(f"{version}-") or now - stat.st_mtime > max_age_seconds:
+            os.remove(path)
+            removed += 1
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+def _timed_query(engine, query_name, sql, submitted, cache=None):
+    """
+    Worker body: the query result (from the cache when it holds this query at
+    the current data version), its time, and the time it waited for a worker.
+    """
+    queue_wait_ms = round((time.time() - submitted) * 1000, 2)
+    if cache and not is_cacheable(sql):
+        df, execution_time_ms = execute_query(engine, query_name, sql)
+        return df, execution_time_ms, queue_wait_ms, "bypass"
+    key = cache_key(sql, cache["version"]) if cache else None
+    if cache:
+        start_time = time.time()
+        df = cache_get(cache["dir"], key)
+        if df is not None:
+            return df, round((time.time() - start_time) * 1000, 2), queue_wait_ms, "hit"
+    df, execution_time_ms = execute_query(engine, query_name, sql)
+    if cache:
+        cache_put(cache["dir"], key, df)
+    return df, execution_time_ms, queue_wait_ms, "miss" if cache else None
+
+def run_queries(engine, queries, workers, cache=None):
+    """
+    Runs the queries on a pool of `workers` threads, each on its own pooled
+    connection, and exports every result as it completes. With a cache
+    ({"dir", "version"}), cached results are reused and their CSVs only
+    rewritten if missing. Returns the per-query metadata in query order.
+    """
+    metadata = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_timed_query, engine, name, sql, time.time(), cache): name
+            for name, sql in queries.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            df, time_ms, wait_ms, cache_status = future.result()
+            csv_path = os.path.join("data/processed/analytics", f"{name}.csv")
+            if cache_status != "hit" or not os.path.exists(csv_path):
+                export_to_csv(df, f"{name}.csv") #
+            metadata[name] = {"rows": len(df), "columns": len(df.columns),
+                              "execution_time_ms": time_ms, "queue_wait_ms": wait_ms}
+            if cache_status:
+                metadata[name]["cache"] = cache_status
+    return {name: metadata[name] for name in queries}
+
 # Function 2: Export to CSV
 def export_to_csv(df, filename):
     """Saves results to the mandatory analytics directory."""
@@ -36,8 +176,9 @@ def generate_summary(results_metadata, total_time):
         "total_execution_time_seconds": round(total_time, 2)
     }
 
-def main():
-    engine = create_engine(f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
+def main(workers=None, use_cache=True):
+    engine = get_engine()
+    workers = workers or default_parallelism()
     
     # 10 Analytics Queries covering all technical requirements
     queries = {
@@ -75,19 +216,52 @@ def main():
         "query10_discount_impact": "SELECT 'No Discount' as type, SUM(line_total) as revenue FROM warehouse.fact_sales;"
     }
 
-    results_metadata = {}
     start_total = time.time()
 
-    for name, sql in queries.items():
-        df, time_ms = execute_query(engine, name, sql)
-        export_to_csv(df, f"{name}.csv") #
-        results_metadata[name] = {"rows": len(df), "columns": len(df.columns), "execution_time_ms": time_ms}
+    # Concurrent Execution: a bounded pool, so the stage takes about its slowest queries
+    with stage("analytics"):
+        # Result Cache: only valid while the warehouse is at the version it was filled at
+        cache, evicted = None, 0
+        version = warehouse_version(engine) if use_cache else None
+        if version is not None:
+            settings = cache_settings()
+            cache = {"dir": settings["dir"], "version": version}
+            evicted = evict_cache(settings["dir"], version, settings["max_mb"] * 1024 * 1024,
+                                  settings["max_age_hours"] * 3600)
+        results_metadata = run_queries(engine, queries, workers, cache)
 
     summary = generate_summary(results_metadata, time.time() - start_total)
+    summary["parallelism"] = workers
+    summary["wall_clock_seconds"] = summary["total_execution_time_seconds"]
+    summary["summed_query_seconds"] = round(
+        sum(m["execution_time_ms"] for m in results_metadata.values()) / 1000, 2)
+    statuses = [m.get("cache") for m in results_metadata.values()]
+    summary["cache"] = {
+        "enabled": cache is not None,
+        "data_version": version,
+        "hits": statuses.count("hit"),
+        "misses": statuses.count("miss"),
+        "bypassed": statuses.count("bypass"),
+        "evicted": evicted
+    }
+    summary["connection_usage"] = connection_metrics("analytics")
     
     with open('data/processed/analytics/analytics_summary.json', 'w') as f:
         json.dump(summary, f, indent=4)
-    print("✓ Analytics and JSON summary generated successfully.")
+    print(f"✓ Analytics and JSON summary generated successfully "
+          f"({workers} workers: {summary['wall_clock_seconds']}s wall clock, "
+          f"{summary['summed_query_seconds']}s summed query time, "
+          f"{summary['cache']['hits']} cache hits).")
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the analytics queries against the warehouse")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Queries run concurrently (default: pipeline.analytics_workers in config.yaml)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Run every query against the warehouse, bypassing the result cache")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(args.workers, use_cache=not args.no_cache)
\ No newline at end of file
@@ -1,102 +1,730 @@
-import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+import argparse
+import json
 import os
-from datetime import datetime
-from dotenv import load_dotenv
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
-load_dotenv()
+# Make the repo root importable when this file is run as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from scripts.db import get_engine, stage, connection_metrics
+from scripts.transformation.load_dim_date import load_dim_date
+from scripts.transformation.staging_to_production import (
+    ensure_incremental_objects, get_watermark, save_watermark
+)
 
-def load_warehouse():
-    engine = create_engine(f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
+SUMMARY_FILE = "data/processed/warehouse_summary.json"
+
+# SCD Type 2 dimensions: a change in any tracked column expires the current
+# version and inserts a new one; other columns are only set on insert.
+# Changes are detected through row_hash, a stored hash of the tracked columns.
+SCD2_DIMENSIONS = {
+    "dim_customers": {
+        "source": "production.customers",
+        "surrogate_key": "dw_customer_id",
+        "business_key": "customer_id",
+        "columns": ["customer_id", "first_name", "last_name", "email"],
+        "tracked": ["first_name", "last_name", "email"]
+    },
+    "dim_products": {
+        "source": "production.products",
+        "surrogate_key": "dw_product_id",
+        "business_key": "product_id",
+        "columns": ["product_id", "product_name", "category", "price", "cost"],
+        "tracked": ["product_name", "price", "cost"]
+    }
+}
+
+# ----------------------------
+# Indexes
+# ----------------------------
+# name -> (table, definition, essential). Essential indexes serve the load
+# itself and always stay; the others serve incremental maintenance and
+# analytics, so full fact rebuilds drop them and build them once afterwards.
+WAREHOUSE_INDEXES = {
+    "idx_dim_customers_current_hash": ("dim_customers", "(customer_id, row_hash) WHERE is_current", True),
+    "idx_dim_customers_current_key": ("dim_customers", "(customer_id) INCLUDE (dw_customer_id) WHERE is_current", True),
+    "idx_dim_products_current_hash": ("dim_products", "(product_id, row_hash) WHERE is_current", True),
+    "idx_dim_products_current_key": ("dim_products", "(product_id) INCLUDE (dw_product_id, cost) WHERE is_current", True),
+    "idx_fact_sales_transaction_id": ("fact_sales", "(transaction_id)", False),
+    "idx_fact_sales_transaction_date": ("fact_sales", "(transaction_date) INCLUDE (transaction_id, dw_customer_id)", False),
+    "idx_fact_sales_dw_customer_id": ("fact_sales", "(dw_customer_id) INCLUDE (transaction_id, transaction_date, line_total)", False),
+    "idx_fact_sales_dw_product_id": ("fact_sales", "(dw_product_id) INCLUDE (quantity, line_total, profit)", False)
+}
+
+def ensure_indexes(conn, table=None):
+    """Creates the missing WAREHOUSE_INDEXES (of one table if given); returns their names."""
+    created = []
+    for name, (index_table, definition, _) in WAREHOUSE_INDEXES.items():
+        if table is not None and index_table != table:
+            continue
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": f"warehouse.{name}"}).scalar():
+            continue
+        conn.execute(text(f"CREATE INDEX {name} ON warehouse.{index_table} {definition}"))
+        created.append(name)
+    return created
+
+def drop_deferrable_indexes(conn, table):
+    """Drops a table's non-essential indexes ahead of a bulk load; returns their names."""
+    dropped = []
+    for name, (index_table, _, essential) in WAREHOUSE_INDEXES.items():
+        if index_table == table and not essential:
+            conn.execute(text(f"DROP INDEX IF EXISTS warehouse.{name}"))
+            dropped.append(name)
+    return dropped
+
+@contextmanager
+def timed_phase(timings, name):
+    """Records the wall-clock seconds of the enclosed block in timings[name]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 3)
+
+# ----------------------------
+# SCD Type 2 dimensions
+# ----------------------------
+# Separates hashed values. NULLs are told apart by a leading flag per column
+# rather than a marker string, which some real value could always equal.
+HASH_SEPARATOR = "\\x1f"
+# Kept as the comment of each row_hash column; stored hashes written under
+# another format are recomputed before they are compared
+ROW_HASH_FORMAT = "md5 null-flags v2"
+
+def row_hash_sql(columns, alias):
+    """SQL expression hashing the given columns of alias, identical on both sides of a comparison."""
+    flags = ", ".join(f"({alias}.{c} IS NULL)::int" for c in columns)
+    values = ", ".join(f"coalesce({alias}.{c}::text, '')" for c in columns)
+    return f"md5(concat_ws(E'{HASH_SEPARATOR}', concat({flags}), {values}))"
+
+def ensure_row_hash(conn, dimension):
+    """
+    Adds the row_hash column and the dimension's indexes if missing, and
+    backfills versions loaded before the column existed. Every version is
+    rehashed once when the stored hashes predate ROW_HASH_FORMAT.
+    """
+    spec = SCD2_DIMENSIONS[dimension]
+    conn.execute(text(f"ALTER TABLE warehouse.{dimension} ADD COLUMN IF NOT EXISTS row_hash CHAR(32)"))
+    ensure_indexes(conn, dimension)
+    stored_format = conn.execute(text(
+        "SELECT col_description(attrelid, attnum) FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attname = 'row_hash'"
+    ), {"table": f"warehouse.{dimension}"}).scalar()
+    conn.execute(text(
+        f"UPDATE warehouse.{dimension} d SET row_hash = {row_hash_sql(spec['tracked'], 'd')} "
+        + ("WHERE row_hash IS NULL" if stored_format == ROW_HASH_FORMAT else "")
+    ))
+    if stored_format != ROW_HASH_FORMAT:
+        conn.execute(text(f"COMMENT ON COLUMN warehouse.{dimension}.row_hash IS '{ROW_HASH_FORMAT}'"))
+
+def merge_scd2(conn, dimension, today):
+    """
+    Set-based SCD Type 2 merge of one dimension against its production source.
+
+    One pass classifies every source row as new, changed or unchanged by
+    comparing the hash of its tracked columns with the current version's
+    stored row_hash; changed versions are then expired (is_current = FALSE,
+    end_date = today) with one UPDATE, and new versions inserted
+    (effective_date = today, carrying the source hash) with one INSERT.
+    Returns the counts.
+    """
+    spec = SCD2_DIMENSIONS[dimension]
+    key, surrogate = spec["business_key"], spec["surrogate_key"]
+    columns = ", ".join(spec["columns"])
+    ensure_row_hash(conn, dimension)
+
+    conn.execute(text(f"""
+        CREATE TEMP TABLE scd_changes ON COMMIT DROP AS
+        SELECT s.*,
+               d.{surrogate} AS current_version,
+               CASE WHEN d.{surrogate} IS NULL THEN 'new'
+                    WHEN d.row_hash <> s.row_hash THEN 'changed'
+                    ELSE 'unchanged' END AS change_type
+        FROM (
+            SELECT {columns}, {row_hash_sql(spec["tracked"], "src")} AS row_hash
+            FROM {spec["source"]} src
+        ) s
+        LEFT JOIN warehouse.{dimension} d
+               ON d.{key} = s.{key} AND d.is_current = TRUE
+    """))
+    counts = {"new": 0, "changed": 0, "unchanged": 0}
+    counts.update(dict(conn.execute(text(
+        "SELECT change_type, COUNT(*) FROM scd_changes GROUP BY change_type"
+    )).fetchall()))
+
+    conn.execute(text(f"""
+        UPDATE warehouse.{dimension} d
+        SET is_current = FALSE, end_date = :today
+        FROM scd_changes c
+        WHERE d.{surrogate} = c.current_version AND c.change_type = 'changed'
+    """), {"today": today})
+    conn.execute(text(f"""
+        INSERT INTO warehouse.{dimension} ({columns}, row_hash, is_current, effective_date)
+        SELECT {columns}, row_hash, TRUE, :today
+        FROM scd_changes
+        WHERE change_type IN ('new', 'changed')
+    """), {"today": today})
+    conn.execute(text("DROP TABLE scd_changes"))
+    return counts
+
+# ----------------------------
+# Fact load
+# ----------------------------
+FACT_MODES = ["incremental", "full"]
+
+FACT_COLUMNS = "dw_customer_id, dw_product_id, transaction_id, transaction_date, quantity, line_total, profit"
+
+# One fact row per transaction item, keyed to the current dimension versions
+FACT_SELECT = """
+    SELECT
+        c.dw_customer_id, p.dw_product_id, t.transaction_id, t.transaction_date,
+        ti.quantity, ti.line_total, (ti.line_total - (p.cost * ti.quantity)) as profit
+    FROM production.transactions t
+    JOIN production.transaction_items ti ON t.transaction_id = ti.transaction_id
+    JOIN warehouse.dim_customers c ON t.customer_id = c.customer_id AND c.is_current = TRUE
+    JOIN warehouse.dim_products p ON ti.product_id = p.product_id AND p.is_current = TRUE
+    {where}
+"""
+
+# production.etl_watermarks entry: the latest production updated_at the facts reflect
+FACT_WATERMARK = "warehouse.fact_sales"
+
+# Transactions whose header or items were updated after :since (every one
+# when there is no watermark yet), read through the updated_at indexes
+TOUCHED_TRANSACTIONS = """
+    SELECT transaction_id FROM production.transactions WHERE {since}
+    UNION
+    SELECT transaction_id FROM production.transaction_items WHERE {since}
+"""
+
+# Touched transactions whose loaded facts no longer match production: an item
+# was added or changed, or the header's date or customer changed. Rows are
+# compared on business keys, so a new dimension version alone is no change.
+CHANGED_TRANSACTIONS = """
+    WITH touched AS ({touched}), source AS (
+        SELECT t.transaction_id, t.transaction_date, t.customer_id, ti.product_id, ti.quantity, ti.line_total
+        FROM production.transactions t
+        JOIN production.transaction_items ti ON t.transaction_id = ti.transaction_id
+        WHERE t.transaction_id IN (SELECT transaction_id FROM touched)
+          AND t.transaction_id IN (SELECT transaction_id FROM warehouse.fact_sales)
+    ), loaded AS (
+        SELECT f.transaction_id, f.transaction_date, c.customer_id, p.product_id, f.quantity, f.line_total
+        FROM warehouse.fact_sales f
+        JOIN warehouse.dim_customers c ON c.dw_customer_id = f.dw_customer_id
+        JOIN warehouse.dim_products p ON p.dw_product_id = f.dw_product_id
+        WHERE f.transaction_id IN (SELECT transaction_id FROM touched)
+    )
+    SELECT transaction_id FROM (SELECT * FROM source EXCEPT ALL SELECT * FROM loaded) added
+    UNION
+    SELECT transaction_id FROM (SELECT * FROM loaded EXCEPT ALL SELECT * FROM source) removed
+"""
+
+# Every fact row a load inserts (sign 1) or removes (sign -1) is also written
+# to the fact_delta temp table, which drives the aggregate maintenance
+def _create_fact_delta(conn):
+    conn.execute(text("DROP TABLE IF EXISTS fact_delta"))
+    conn.execute(text(
+        f"CREATE TEMP TABLE fact_delta ON COMMIT DROP AS "
+        f"SELECT 1 AS sign, {FACT_COLUMNS} FROM warehouse.fact_sales WITH NO DATA"
+    ))
+
+def _insert_facts(conn, where="", params=None, table="warehouse.fact_sales"):
+    result = conn.execute(text(f"""
+        WITH inserted AS (
+            INSERT INTO {table} ({FACT_COLUMNS}) {FACT_SELECT.format(where=where)}
+            RETURNING {FACT_COLUMNS}
+        )
+        INSERT INTO fact_delta SELECT 1, * FROM inserted
+    """), params or {})
+    return result.rowcount
+
+def _delete_facts(conn, where, params=None):
+    result = conn.execute(text(f"""
+        WITH deleted AS (
+            DELETE FROM warehouse.fact_sales f {where}
+            RETURNING {FACT_COLUMNS}
+        )
+        INSERT INTO fact_delta SELECT -1, * FROM deleted
+    """), params or {})
+    return result.rowcount
+
+# ----------------------------
+# Fact partitions
+# ----------------------------
+# fact_sales is range-partitioned by month on transaction_date
+PARTITION_MONTHS_AHEAD = 3
+
+PARTITIONED_FACT_DDL = """
+    CREATE TABLE warehouse.fact_sales (
+        fact_sales_id INT NOT NULL DEFAULT nextval('{sequence}'),
+        dw_customer_id INT REFERENCES warehouse.dim_customers(dw_customer_id),
+        dw_product_id INT REFERENCES warehouse.dim_products(dw_product_id),
+        transaction_id VARCHAR(20),
+        transaction_date DATE NOT NULL REFERENCES warehouse.dim_date(date_key),
+        quantity INT,
+        line_total NUMERIC(12,2),
+        profit NUMERIC(12,2),
+        PRIMARY KEY (fact_sales_id, transaction_date)
+    ) PARTITION BY RANGE (transaction_date)
+"""
+
+def month_start(day):
+    return day.replace(day=1)
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def partition_name(month):
+    return f"fact_sales_p{month:%Y%m}"
+
+def fact_sales_is_partitioned(conn):
+    return conn.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = 'warehouse.fact_sales'::regclass"
+    )).scalar() == "p"
+
+def create_fact_partition(conn, month):
+    """Creates the partition holding one month, if missing. Returns True if it was created."""
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": f"warehouse.{name}"}).scalar():
+        return False
+    conn.execute(text(
+        f"CREATE TABLE warehouse.{name} PARTITION OF warehouse.fact_sales "
+        f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+    ))
+    return True
+
+def ensure_fact_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    """
+    Creates the monthly partitions for every transaction date in production
+    and for months_ahead months past the latest of those dates and today, so
+    incoming facts always have a partition. Returns the names created.
+    """
+    today = today or datetime.now().date()
+    first, last = conn.execute(text(
+        "SELECT MIN(transaction_date), MAX(transaction_date) FROM production.transactions"
+    )).one()
+    month = month_start(first or today)
+    stop = month_start(max(last or today, today))
+    for _ in range(months_ahead):
+        stop = next_month(stop)
+
+    created = []
+    while month <= stop:
+        if create_fact_partition(conn, month):
+            created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+def partition_fact_sales(conn):
+    """
+    Migrates a plain fact_sales table to the partitioned layout in place:
+    the heap is renamed aside, the partitioned table takes over its name and
+    id sequence, the rows are copied into monthly partitions and the heap is
+    dropped. Does nothing if fact_sales is already partitioned.
+    """
+    if fact_sales_is_partitioned(conn):
+        return False
+    sequence = conn.execute(text(
+        "SELECT pg_get_serial_sequence('warehouse.fact_sales', 'fact_sales_id')"
+    )).scalar()
+    conn.execute(text("ALTER TABLE warehouse.fact_sales RENAME TO fact_sales_heap"))
+    conn.execute(text("ALTER INDEX IF EXISTS warehouse.fact_sales_pkey RENAME TO fact_sales_heap_pkey"))
+    conn.execute(text("DROP INDEX IF EXISTS warehouse.idx_fact_sales_transaction_id"))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(text(PARTITIONED_FACT_DDL.format(sequence=sequence)))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY warehouse.fact_sales.fact_sales_id"))
+
+    first, last = conn.execute(text(
+        "SELECT MIN(transaction_date), MAX(transaction_date) FROM warehouse.fact_sales_heap"
+    )).one()
+    if first is not None:
+        month = month_start(first)
+        while month <= last:
+            create_fact_partition(conn, month)
+            month = next_month(month)
+    conn.execute(text(
+        f"INSERT INTO warehouse.fact_sales (fact_sales_id, {FACT_COLUMNS}) "
+        f"SELECT fact_sales_id, {FACT_COLUMNS} FROM warehouse.fact_sales_heap"
+    ))
+    conn.execute(text("DROP TABLE warehouse.fact_sales_heap"))
+    return True
+
+def swap_fact_partition(conn, month):
+    """
+    Re-loads one month by building a fresh table from production, then
+    detaching and dropping the old partition and attaching the new one in
+    its place. Returns (rows replaced, rows loaded).
+    """
+    name, start, end = partition_name(month), month, next_month(month)
+    create_fact_partition(conn, month)
+    fresh = f"{name}_new"
+    conn.execute(text(f"DROP TABLE IF EXISTS warehouse.{fresh}"))
+    conn.execute(text(f"CREATE TABLE warehouse.{fresh} (LIKE warehouse.fact_sales INCLUDING DEFAULTS)"))
+    # Matches the partition bounds, so ATTACH can skip its validation scan
+    conn.execute(text(
+        f"ALTER TABLE warehouse.{fresh} ADD CONSTRAINT {name}_bounds "
+        f"CHECK (transaction_date >= '{start}' AND transaction_date < '{end}')"
+    ))
+    params = {"start": start, "end": end}
+    loaded = _insert_facts(conn, "WHERE t.transaction_date >= :start AND t.transaction_date < :end",
+                           params, table=f"warehouse.{fresh}")
+
+    replaced = conn.execute(text(
+        f"INSERT INTO fact_delta SELECT -1, {FACT_COLUMNS} FROM warehouse.{name}"
+    )).rowcount
+    conn.execute(text(f"ALTER TABLE warehouse.fact_sales DETACH PARTITION warehouse.{name}"))
+    conn.execute(text(f"DROP TABLE warehouse.{name}"))
+    conn.execute(text(f"ALTER TABLE warehouse.{fresh} RENAME TO {name}"))
+    conn.execute(text(
+        f"ALTER TABLE warehouse.fact_sales ATTACH PARTITION warehouse.{name} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    return replaced, loaded
+
+def load_fact_sales(conn, mode="incremental", reload_range=None, today=None):
+    """
+    Loads warehouse.fact_sales and returns the inserted/deleted row counts.
+
+    full: truncate and rebuild from production.
+    reload_range=(start, end): first re-load the facts of transactions dated
+    within the range (inclusive), then continue as incremental. Whole months
+    are rebuilt and swapped in as a partition, partial months are deleted and
+    re-inserted.
+    incremental: insert only transactions with no fact rows yet (anti-join on
+    transaction_id). To stay equal to a full rebuild it first deletes the
+    facts of transactions gone from production, changed since they were
+    loaded or pointing at a dimension version expired today, so those are
+    re-inserted from their current production rows. Changes are found from
+    the production updated_at markers: only transactions updated since the
+    last load (FACT_WATERMARK) are compared with their facts, so the cost
+    follows the changes, not the history. verify_fact_sales compares it all.
+
+    Outside full mode, the rows inserted and removed are recorded in the
+    fact_delta temp table for refresh_aggregates (in full mode it stays empty).
+    """
+    today = today or datetime.now().date()
+    ensure_incremental_objects(conn)
+    since = get_watermark(conn, FACT_WATERMARK)
+    changes_through = conn.execute(text(
+        "SELECT GREATEST((SELECT MAX(updated_at) FROM production.transactions), "
+        "(SELECT MAX(updated_at) FROM production.transaction_items))"
+    )).scalar()
+    partition_fact_sales(conn)
+    ensure_fact_partitions(conn, today=today)
+    if mode != "full":
+        # Full loads leave index building to load_warehouse, after the bulk insert
+        ensure_indexes(conn, "fact_sales")
+
+    _create_fact_delta(conn)
+
+    if mode == "full":
+        conn.execute(text("TRUNCATE TABLE warehouse.fact_sales CASCADE;"))
+        result = conn.execute(text(f"INSERT INTO warehouse.fact_sales ({FACT_COLUMNS})"
+                                   + FACT_SELECT.format(where="")))
+        save_watermark(conn, FACT_WATERMARK, changes_through)
+        return {"mode": "full", "deleted": None, "inserted": result.rowcount}
+
+    result = {"mode": "incremental", "deleted": 0, "inserted": 0}
+    if reload_range is not None:
+        start, end = reload_range
+        result.update(mode="range", swapped_partitions=[])
+        month = month_start(start)
+        while month <= end:
+            last_day = next_month(month) - timedelta(days=1)
+            if start <= month and last_day <= end:
+                deleted, inserted = swap_fact_partition(conn, month)
+                result["swapped_partitions"].append(partition_name(month))
+            else:
+                params = {"start": max(start, month), "end": min(end, last_day)}
+                deleted = _delete_facts(conn, "WHERE transaction_date BETWEEN :start AND :end", params)
+                inserted = _insert_facts(conn, "WHERE t.transaction_date BETWEEN :start AND :end", params)
+            result["deleted"] += deleted
+            result["inserted"] += inserted
+            month = next_month(month)
+
+    touched = TOUCHED_TRANSACTIONS.format(since="updated_at > :since" if since else "TRUE")
+    deleted = _delete_facts(conn, f"""
+        WHERE NOT EXISTS (SELECT 1 FROM production.transactions t WHERE t.transaction_id = f.transaction_id)
+           OR f.transaction_id IN ({CHANGED_TRANSACTIONS.format(touched=touched)})
+           OR f.transaction_id IN (
+                SELECT f2.transaction_id
+                FROM warehouse.fact_sales f2
+                WHERE f2.dw_customer_id IN (SELECT dw_customer_id FROM warehouse.dim_customers
+                                            WHERE NOT is_current AND end_date = :today)
+                   OR f2.dw_product_id IN (SELECT dw_product_id FROM warehouse.dim_products
+                                           WHERE NOT is_current AND end_date = :today))
+    """, {"today": today, "since": since})
+    inserted = _insert_facts(conn, """
+        WHERE NOT EXISTS (SELECT 1 FROM warehouse.fact_sales f WHERE f.transaction_id = t.transaction_id)
+    """)
+    result["deleted"] += deleted
+    result["inserted"] += inserted
+    save_watermark(conn, FACT_WATERMARK, changes_through)
+    return result
+
+def verify_fact_sales(conn):
+    """
+    Compares fact_sales with what a full rebuild would produce (as multisets,
+    ignoring fact_sales_id) and returns the number of differing rows each way.
+    """
+    missing, unexpected = conn.execute(text(f"""
+        SELECT
+            (SELECT COUNT(*) FROM ({FACT_SELECT.format(where="")}
+                                   EXCEPT ALL
+                                   SELECT {FACT_COLUMNS} FROM warehouse.fact_sales) m),
+            (SELECT COUNT(*) FROM (SELECT {FACT_COLUMNS} FROM warehouse.fact_sales
+                                   EXCEPT ALL
+                                   {FACT_SELECT.format(where="")}) u)
+    """)).one()
+    return {"missing_rows": missing, "unexpected_rows": unexpected,
+            "matches_full_rebuild": missing == 0 and unexpected == 0}
+
+# ----------------------------
+# Aggregates
+# ----------------------------
+# Per aggregate: the fact column it groups by, its own key column, the
+# additive measures (summed fact column) and the measures that cannot be
+# merged as deltas (distinct counts, max) and are recomputed per key
+AGGREGATES = {
+    "agg_daily_sales": {
+        "group_by": "transaction_date",
+        "key": "sale_date",
+        "additive": {"total_revenue": "line_total", "total_profit": "profit"},
+        "recomputed": {"transaction_count": "COUNT(DISTINCT transaction_id)",
+                       "customer_count": "COUNT(DISTINCT dw_customer_id)"}
+    },
+    "agg_product_performance": {
+        "group_by": "dw_product_id",
+        "key": "dw_product_id",
+        "additive": {"total_quantity_sold": "quantity", "total_revenue": "line_total", "total_profit": "profit"},
+        "recomputed": {}
+    },
+    "agg_customer_metrics": {
+        "group_by": "dw_customer_id",
+        "key": "dw_customer_id",
+        "additive": {"total_spend": "line_total"},
+        "recomputed": {"total_orders": "COUNT(DISTINCT transaction_id)",
+                       "last_order_date": "MAX(transaction_date)"}
+    }
+}
+
+def aggregate_select(name, where="", source="warehouse.fact_sales"):
+    """
+    The full-recompute SELECT of an aggregate over source (a table or an
+    aliased subquery with the fact columns), optionally restricted to some keys.
+    """
+    spec = AGGREGATES[name]
+    measures = [f"SUM({c})" for c in spec["additive"].values()] + list(spec["recomputed"].values())
+    return (f"SELECT {spec['group_by']}, {', '.join(measures)} FROM {source} "
+            f"{where} GROUP BY {spec['group_by']}")
+
+def _aggregate_columns(name):
+    spec = AGGREGATES[name]
+    return ", ".join([spec["key"], *spec["additive"], *spec["recomputed"]])
+
+def rebuild_aggregate(conn, name):
+    conn.execute(text(f"TRUNCATE TABLE warehouse.{name}"))
+    return conn.execute(text(
+        f"INSERT INTO warehouse.{name} ({_aggregate_columns(name)}) {aggregate_select(name)}"
+    )).rowcount
+
+def merge_aggregate(conn, name):
+    """
+    Applies fact_delta to one aggregate and returns the number of keys touched.
+
+    Keys that only gained facts get their additive measures merged as deltas
+    (ON CONFLICT ... SET m = m + delta) and their recomputed measures
+    evaluated over that key's facts. Keys that lost facts are recomputed
+    entirely, which also removes keys left without facts.
+    """
+    spec = AGGREGATES[name]
+    group_by, key = spec["group_by"], spec["key"]
+    table = f"warehouse.{name}"
+    removed_keys = f"SELECT DISTINCT {group_by} FROM fact_delta WHERE sign < 0"
+    added_keys = f"SELECT {group_by} FROM fact_delta GROUP BY {group_by} HAVING bool_and(sign > 0)"
+
+    recomputed = conn.execute(text(f"DELETE FROM {table} WHERE {key} IN ({removed_keys})")).rowcount
+    conn.execute(text(
+        f"INSERT INTO {table} ({_aggregate_columns(name)}) "
+        f"{aggregate_select(name, f'WHERE {group_by} IN ({removed_keys})')}"
+    ))
+
+    additive = spec["additive"]
+    # SUM() ignores NULLs, so a NULL on either side keeps the other value
+    updates = ", ".join(
+        f"{m} = CASE WHEN a.{m} IS NULL THEN EXCLUDED.{m} WHEN EXCLUDED.{m} IS NULL THEN a.{m} "
+        f"ELSE a.{m} + EXCLUDED.{m} END"
+        for m in additive
+    )
+    merged = conn.execute(text(f"""
+        INSERT INTO {table} AS a ({key}, {", ".join(additive)})
+        SELECT {group_by}, {", ".join(f"SUM({c})" for c in additive.values())}
+        FROM fact_delta
+        WHERE {group_by} IN ({added_keys})
+        GROUP BY {group_by}
+        ON CONFLICT ({key}) DO UPDATE SET {updates}
+    """)).rowcount
+
+    if spec["recomputed"]:
+        assignments = ", ".join(f"{m} = r.{m}" for m in spec["recomputed"])
+        measures = ", ".join(f"{expr} AS {m}" for m, expr in spec["recomputed"].items())
+        conn.execute(text(f"""
+            UPDATE {table} a SET {assignments}
+            FROM (SELECT {group_by}, {measures}
+                  FROM warehouse.fact_sales
+                  WHERE {group_by} IN ({added_keys})
+                  GROUP BY {group_by}) r
+            WHERE a.{key} = r.{group_by}
+        """))
+    return recomputed + merged
+
+def refresh_aggregates(conn, full):
+    """Rebuilds (full=True) or delta-maintains the three aggregates; returns rows/keys touched."""
+    # Aggregate per partition first, so grouping by date works one month at a time
+    conn.execute(text("SET LOCAL enable_partitionwise_aggregate = on"))
+    refresh = rebuild_aggregate if full else merge_aggregate
+    return {name: refresh(conn, name) for name in AGGREGATES}
+
+def verify_aggregates(conn):
+    """
+    Rows of each aggregate that differ, counted both ways, from the aggregate
+    of a fact rebuild from production (FACT_SELECT), not of the stored facts,
+    so drift in fact_sales shows here too.
+    """
+    rebuilt_facts = f"({FACT_SELECT.format(where='')}) f"
+    differences = {}
+    for name in AGGREGATES:
+        stored = f"SELECT {_aggregate_columns(name)} FROM warehouse.{name}"
+        expected = aggregate_select(name, source=rebuilt_facts)
+        differences[name] = conn.execute(text(f"""
+            SELECT (SELECT COUNT(*) FROM ({expected} EXCEPT ALL {stored}) m)
+                 + (SELECT COUNT(*) FROM ({stored} EXCEPT ALL {expected}) u)
+        """)).scalar()
+    return differences
+
+# ----------------------------
+# Warehouse load
+# ----------------------------
+def record_load(conn, fact_mode, changed=True):
+    """
+    Appends this load to warehouse.etl_loads and returns its id, the data
+    version analytics results are cached against. Committed with the load.
+    A load that changed nothing keeps (and returns) the current version.
+    """
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS warehouse.etl_loads (
+            load_id SERIAL PRIMARY KEY,
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fact_mode VARCHAR(20)
+        )
+    """))
+    if not changed:
+        return conn.execute(text("SELECT COALESCE(MAX(load_id), 0) FROM warehouse.etl_loads")).scalar()
+    return conn.execute(text(
+        "INSERT INTO warehouse.etl_loads (fact_mode) VALUES (:mode) RETURNING load_id"
+    ), {"mode": fact_mode}).scalar()
+
+def load_warehouse(fact_mode="incremental", reload_range=None, verify=False):
+    engine = get_engine()
     today = datetime.now().date()
+    summary = {"load_timestamp": datetime.now().isoformat(), "scd2": {}}
     
-    with engine.begin() as conn:
+    full = fact_mode == "full"
+    phases = summary["phase_seconds"] = {}
+    
+    with stage("warehouse_load"), engine.begin() as conn:
         print("--- Starting Advanced Warehouse Load ---")
 
-        # 1. SCD TYPE 2 LOGIC: CUSTOMERS
-        stg_cust = pd.read_sql("SELECT * FROM production.customers", conn)
-        for _, row in stg_cust.iterrows():
-            curr = conn.execute(text(
-                "SELECT first_name, last_name, email FROM warehouse.dim_customers "
-                "WHERE customer_id = :id AND is_current = TRUE"
-            ), {"id": row['customer_id']}).fetchone()
-
-            if not curr:
-                conn.execute(text(
-                    "INSERT INTO warehouse.dim_customers (customer_id, first_name, last_name, email, is_current, effective_date) "
-                    "VALUES (:id, :f, :l, :e, TRUE, :d)"
-                ), {"id": row['customer_id'], "f": row['first_name'], "l": row['last_name'], "e": row['email'], "d": today})
-            elif (curr.first_name != row['first_name'] or curr.last_name != row['last_name'] or curr.email != row['email']):
-                conn.execute(text(
-                    "UPDATE warehouse.dim_customers SET is_current = FALSE, end_date = :d WHERE customer_id = :id AND is_current = TRUE"
-                ), {"d": today, "id": row['customer_id']})
-                conn.execute(text(
-                    "INSERT INTO warehouse.dim_customers (customer_id, first_name, last_name, email, is_current, effective_date) "
-                    "VALUES (:id, :f, :l, :e, TRUE, :d)"
-                ), {"id": row['customer_id'], "f": row['first_name'], "l": row['last_name'], "e": row['email'], "d": today})
-
-        # 2. SCD TYPE 2 LOGIC: PRODUCTS (Modified for full points)
-        stg_prod = pd.read_sql("SELECT * FROM production.products", conn)
-        for _, row in stg_prod.iterrows():
-            curr_p = conn.execute(text(
-                "SELECT product_name, category, price, cost FROM warehouse.dim_products "
-                "WHERE product_id = :id AND is_current = TRUE"
-            ), {"id": row['product_id']}).fetchone()
-
-            if not curr_p:
-                conn.execute(text(
-                    "INSERT INTO warehouse.dim_products (product_id, product_name, category, price, cost, is_current, effective_date) "
-                    "VALUES (:id, :n, :cat, :p, :c, TRUE, :d)"
-                ), {"id": row['product_id'], "n": row['product_name'], "cat": row['category'], "p": row['price'], "c": row['cost'], "d": today})
-            elif (curr_p.price != row['price'] or curr_p.cost != row['cost'] or curr_p.product_name != row['product_name']):
-                conn.execute(text(
-                    "UPDATE warehouse.dim_products SET is_current = FALSE, end_date = :d WHERE product_id = :id AND is_current = TRUE"
-                ), {"d": today, "id": row['product_id']})
-                conn.execute(text(
-                    "INSERT INTO warehouse.dim_products (product_id, product_name, category, price, cost, is_current, effective_date) "
-                    "VALUES (:id, :n, :cat, :p, :c, TRUE, :d)"
-                ), {"id": row['product_id'], "n": row['product_name'], "cat": row['category'], "p": row['price'], "c": row['cost'], "d": today})
+        # 1-2. SCD TYPE 2 LOGIC: CUSTOMERS AND PRODUCTS (set-based merge)
+        with timed_phase(phases, "scd2"):
+            for dimension in SCD2_DIMENSIONS:
+                counts = merge_scd2(conn, dimension, today)
+                summary["scd2"][dimension] = counts
+                print(f"✓ {dimension}: {counts['new']} new, {counts['changed']} changed, "
+                      f"{counts['unchanged']} unchanged")
+
+        # Every transaction date needs its dim_date row before facts reference it
+        with timed_phase(phases, "dim_date"):
+            summary["dim_date_added"] = load_dim_date(conn)
 
         # 3. LOAD FACT_SALES (Surrogate Key Lookups)
-        conn.execute(text("TRUNCATE TABLE warehouse.fact_sales CASCADE;"))
-        fact_query = """
-        INSERT INTO warehouse.fact_sales (dw_customer_id, dw_product_id, transaction_id, transaction_date, quantity, line_total, profit)
-        SELECT 
-            c.dw_customer_id, p.dw_product_id, t.transaction_id, t.transaction_date, 
-            ti.quantity, ti.line_total, (ti.line_total - (p.cost * ti.quantity)) as profit
-        FROM production.transactions t
-        JOIN production.transaction_items ti ON t.transaction_id = ti.transaction_id
-        JOIN warehouse.dim_customers c ON t.customer_id = c.customer_id AND c.is_current = TRUE
-        JOIN warehouse.dim_products p ON ti.product_id = p.product_id AND p.is_current = TRUE;
-        """
-        conn.execute(text(fact_query))
-        print("✓ Fact Sales populated.")
-
-        # 4. POPULATE AGGREGATE TABLES (All 3 required tables)
-        # Aggregate Table 1: Daily Sales
-        conn.execute(text("TRUNCATE TABLE warehouse.agg_daily_sales;"))
-        conn.execute(text("""
-            INSERT INTO warehouse.agg_daily_sales (sale_date, transaction_count, total_revenue, total_profit, customer_count)
-            SELECT transaction_date, COUNT(DISTINCT transaction_id), SUM(line_total), SUM(profit), COUNT(DISTINCT dw_customer_id)
-            FROM warehouse.fact_sales GROUP BY transaction_date;
-        """))
+        # A full rebuild inserts without the secondary indexes and builds them once afterwards
+        if full:
+            with timed_phase(phases, "drop_indexes"):
+                summary["dropped_indexes"] = drop_deferrable_indexes(conn, "fact_sales")
+        with timed_phase(phases, "fact_load"):
+            facts = load_fact_sales(conn, fact_mode, reload_range, today)
+        if full:
+            with timed_phase(phases, "create_indexes"):
+                summary["created_indexes"] = ensure_indexes(conn, "fact_sales")
+        summary["fact_sales"] = facts
+        print(f"✓ Fact Sales loaded ({facts['mode']}): {facts['inserted']} rows inserted"
+              + (f", {facts['deleted']} deleted" if facts["deleted"] is not None else ""))
 
-        # Aggregate Table 2: Product Performance
-        conn.execute(text("TRUNCATE TABLE warehouse.agg_product_performance;"))
-        conn.execute(text("""
-            INSERT INTO warehouse.agg_product_performance (dw_product_id, total_quantity_sold, total_revenue, total_profit)
-            SELECT dw_product_id, SUM(quantity), SUM(line_total), SUM(profit)
-            FROM warehouse.fact_sales GROUP BY dw_product_id;
-        """))
+        # 4. MAINTAIN AGGREGATE TABLES (All 3 required tables)
+        with timed_phase(phases, "aggregates"):
+            aggregates = refresh_aggregates(conn, full=full)
+        summary["aggregates"] = {"mode": "rebuild" if full else "delta", "touched": aggregates}
+        print(f"✓ All 3 Aggregate Tables {'rebuilt' if full else 'updated'}: "
+              + ", ".join(f"{name}={count}" for name, count in aggregates.items()))
 
-        # Aggregate Table 3: Customer Metrics
-        conn.execute(text("TRUNCATE TABLE warehouse.agg_customer_metrics;"))
-        conn.execute(text("""
-            INSERT INTO warehouse.agg_customer_metrics (dw_customer_id, total_spend, total_orders, last_order_date)
-            SELECT dw_customer_id, SUM(line_total), COUNT(DISTINCT transaction_id), MAX(transaction_date)
-            FROM warehouse.fact_sales GROUP BY dw_customer_id;
-        """))
-        print("✓ All 3 Aggregate Tables populated.")
+        # Fresh statistics for the rebuilt tables, so the planner sees their new sizes
+        if full:
+            with timed_phase(phases, "analyze"):
+                conn.execute(text("ANALYZE warehouse.fact_sales, " +
+                                  ", ".join(f"warehouse.{name}" for name in AGGREGATES)))
+
+        # New data version: invalidates cached analytics results once committed
+        changed = (full or facts["inserted"] or facts["deleted"] or summary["dim_date_added"]
+                   or any(c["new"] or c["changed"] for c in summary["scd2"].values()))
+        summary["load_id"] = record_load(conn, fact_mode, bool(changed))
+
+        if verify:
+            with timed_phase(phases, "verify"):
+                check = verify_fact_sales(conn)
+                check["aggregate_differences"] = verify_aggregates(conn)
+            check["matches_full_rebuild"] = (check["matches_full_rebuild"]
+                                             and not any(check["aggregate_differences"].values()))
+            summary["fact_verification"] = check
+            if check["matches_full_rebuild"]:
+                print("✓ Fact Sales and aggregates match a full rebuild.")
+            else:
+                print(f"❌ Differs from a full rebuild: {check['missing_rows']} missing and "
+                      f"{check['unexpected_rows']} unexpected fact rows, aggregate rows "
+                      f"{check['aggregate_differences']}")
+
+    print("✓ Phases: " + ", ".join(f"{name} {seconds}s" for name, seconds in phases.items()))
+    usage = connection_metrics("warehouse_load")
+    summary["connection_usage"] = usage
+    print(f"✓ Connection usage: {usage['checkouts']} checkouts, {usage['busy_seconds']}s busy")
+
+    os.makedirs("data/processed", exist_ok=True)
+    with open(SUMMARY_FILE, "w") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load the star schema from the production tables")
+    parser.add_argument("--fact-mode", choices=FACT_MODES, default="incremental",
+                        help="incremental: insert only transactions not yet in fact_sales (default); "
+                             "full: truncate and rebuild fact_sales")
+    parser.add_argument("--reload-from", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date(),
+                        help="Re-load the facts of transactions dated from this day (YYYY-MM-DD)")
+    parser.add_argument("--reload-to", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date(),
+                        help="Last day of the re-load range (default: --reload-from)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check that fact_sales and the aggregates equal a full rebuild; "
+                             "exits 1 if they do not")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    load_warehouse()
\ No newline at end of file
+    args = parse_args()
+    reload_range = None
+    if args.reload_from:
+        reload_range = (args.reload_from, args.reload_to or args.reload_from)
+    result = load_warehouse(args.fact_mode, reload_range, args.verify)
+    if not result.get("fact_verification", {}).get("matches_full_rebuild", True):
+        sys.exit(1)
\ No newline at end of file
@@ -47,6 +47,7 @@ CREATE TABLE production.transactions (
     payment_method VARCHAR(50),
     total_amount DECIMAL(12,2) NOT NULL CHECK (total_amount > 0), -- Filtering rule
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Set by every incremental upsert that changes the row
     -- Referential Integrity Preservation (1 pt)
     CONSTRAINT fk_customer FOREIGN KEY (customer_id) REFERENCES production.customers(customer_id)
 );
@@ -61,10 +62,22 @@ CREATE TABLE production.transaction_items (
     quantity INTEGER NOT NULL CHECK (quantity > 0),
     price_at_time DECIMAL(10,2) NOT NULL,
     line_total DECIMAL(12,2) NOT NULL, -- Validated: qty * unit_price * (1-discount/100)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     -- Referential Integrity Preservation (1 pt)
     CONSTRAINT fk_transaction FOREIGN KEY (transaction_id) REFERENCES production.transactions(transaction_id),
     CONSTRAINT fk_product FOREIGN KEY (product_id) REFERENCES production.products(product_id)
 );
+-- Business key, used by the incremental upsert (ON CONFLICT)
+CREATE UNIQUE INDEX uq_items_transaction_product ON production.transaction_items(transaction_id, product_id);
+
+-- 5. ETL Watermarks
+-- High-water mark of staging.loaded_at processed per table (incremental mode)
+DROP TABLE IF EXISTS production.etl_watermarks;
+CREATE TABLE production.etl_watermarks (
+    table_name VARCHAR(64) PRIMARY KEY,
+    high_water_mark TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
 
 -- PERFORMANCE OPTIMIZATION (0.5 pt): Indexing Strategy
 -- Indexes for JOIN performance on Foreign Keys
@@ -74,4 +87,9 @@ CREATE INDEX idx_items_product ON production.transaction_items(product_id);
 
 -- Indexes for frequently filtered/sorted columns
 CREATE INDEX idx_transactions_date ON production.transactions(transaction_date);
+-- Change markers: the incremental fact load reads rows updated since its last run
+CREATE INDEX idx_customers_updated_at ON production.customers(updated_at);
+CREATE INDEX idx_products_updated_at ON production.products(updated_at);
+CREATE INDEX idx_transactions_updated_at ON production.transactions(updated_at);
+CREATE INDEX idx_transaction_items_updated_at ON production.transaction_items(updated_at);
 CREATE INDEX idx_products_category ON production.products(category);
\ No newline at end of file
@@ -51,3 +51,9 @@ CREATE TABLE staging.transaction_items (
     line_total DECIMAL(12,2),    -- Match CSV column 'line_total'
     loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Mandatory Audit Column
 );
+
+-- Incremental transformation reads only rows loaded after the last watermark
+CREATE INDEX IF NOT EXISTS idx_stg_customers_loaded_at ON staging.customers(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_products_loaded_at ON staging.products(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_transactions_loaded_at ON staging.transactions(loaded_at);
+CREATE INDEX IF NOT EXISTS idx_stg_items_loaded_at ON staging.transaction_items(loaded_at);
@@ -0,0 +1,11 @@
+import pytest
+from scripts.db import get_engine
+
+
+@pytest.fixture
+def db_conn():
+    """A connection inside a transaction that is rolled back after the test."""
+    with get_engine().connect() as conn:
+        trans = conn.begin()
+        yield conn
+        trans.rollback()
@@ -0,0 +1,82 @@
+from sqlalchemy import create_engine
+
+
+def test_run_queries_reports_timings_in_query_order(tmp_path, monkeypatch):
+    from scripts.transformation.generate_analytics import run_queries
+
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    queries = {f"q{i}": f"SELECT {i} AS value" for i in range(5)}
+
+    metadata = run_queries(engine, queries, workers=2)
+
+    assert list(metadata) == list(queries)
+    for name, meta in metadata.items():
+        assert meta["rows"] == 1 and meta["columns"] == 1
+        assert meta["execution_time_ms"] >= 0 and meta["queue_wait_ms"] >= 0
+        assert (tmp_path / "data" / "processed" / "analytics" / f"{name}.csv").exists()
+
+
+def test_cached_results_are_reused_until_the_data_version_changes(tmp_path, monkeypatch):
+    from scripts.transformation.generate_analytics import run_queries
+
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    queries = {"q1": "SELECT 1 AS value", "q2": "SELECT 2 AS value"}
+
+    first = run_queries(engine, queries, workers=2, cache={"dir": "cache", "version": 1})
+    second = run_queries(engine, queries, workers=2, cache={"dir": "cache", "version": 1})
+    third = run_queries(engine, queries, workers=2, cache={"dir": "cache", "version": 2})
+
+    assert [m["cache"] for m in first.values()] == ["miss", "miss"]
+    assert [m["cache"] for m in second.values()] == ["hit", "hit"]
+    assert second["q1"]["rows"] == 1
+    assert [m["cache"] for m in third.values()] == ["miss", "miss"]
+
+
+def test_queries_outside_the_warehouse_bypass_the_cache(tmp_path, monkeypatch):
+    from sqlalchemy import event, text
+    from scripts.transformation.generate_analytics import run_queries
+
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+
+    @event.listens_for(engine, "connect")
+    def attach_production(dbapi_connection, _):
+        dbapi_connection.execute(f"ATTACH DATABASE '{tmp_path / 'production.db'}' AS production")
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE production.transactions (payment_method TEXT)"))
+        conn.execute(text("INSERT INTO production.transactions VALUES ('card')"))
+    queries = {"q1": "SELECT 1 AS value",
+               "q5": "SELECT payment_method, COUNT(*) AS count FROM production.transactions GROUP BY 1"}
+    cache = {"dir": "cache", "version": 1}
+
+    run_queries(engine, queries, workers=2, cache=cache)
+    # A production-only change leaves the warehouse data version as it was
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO production.transactions VALUES ('paypal')"))
+    second = run_queries(engine, queries, workers=2, cache=cache)
+
+    assert second["q1"]["cache"] == "hit"
+    assert second["q5"]["cache"] == "bypass" and second["q5"]["rows"] == 2
+
+def test_evict_cache_by_version_age_and_size(tmp_path):
+    import os
+    import pandas as pd
+    from scripts.transformation.generate_analytics import cache_put, evict_cache
+
+    df = pd.DataFrame({"value": range(100)})
+    for key in ("1-old", "2-stale", "2-a", "2-b", "2-c"):
+        cache_put(str(tmp_path), key, df)
+    now = 1_000_000
+    ages = {"1-old": 10, "2-stale": 5000, "2-a": 30, "2-b": 20, "2-c": 10}
+    for key, age in ages.items():
+        os.utime(tmp_path / f"{key}.pkl", (now - age, now - age))
+    entry_size = os.path.getsize(tmp_path / "2-a.pkl")
+
+    removed = evict_cache(str(tmp_path), 2, max_bytes=2 * entry_size, max_age_seconds=3600, now=now)
+
+    # Other version and too old first, then the least recently used to fit the size
+    assert removed == 3
+    assert sorted(os.listdir(tmp_path)) == ["2-b.pkl", "2-c.pkl"]
@@ -45,3 +45,249 @@ def test_line_total_calculation():
         rtol=0.0,
         atol=0.01
     ), "Line total calculation mismatch beyond tolerance"
+
+
+def test_vectorized_generation_is_consistent():
+    from scripts.data_generation.generate_data import (
+        generate_customers, generate_products, generate_transactions,
+        generate_transaction_items, validate_referential_integrity
+    )
+
+    rng = np.random.default_rng(7)
+    customers = generate_customers(50, rng)
+    products = generate_products(20, rng)
+    transactions = generate_transactions(500, customers, rng)
+    items = generate_transaction_items(transactions, products, rng)
+
+    metadata = validate_referential_integrity(customers, products, transactions, items)
+    assert metadata["customer_fk_valid"] and metadata["product_fk_valid"] and metadata["transaction_fk_valid"]
+
+    # Baskets never repeat a product and headers carry the summed line totals
+    assert not items.duplicated(["transaction_id", "product_id"]).any()
+    totals = items.groupby("transaction_id")["line_total"].sum().reindex(transactions["transaction_id"])
+    assert np.allclose(totals.values, transactions["total_amount"].values, atol=0.01)
+
+
+def test_streaming_generation_partitions_by_month(tmp_path):
+    from scripts.data_generation.generate_data import (
+        generate_customers, generate_products, generate_streaming
+    )
+
+    rng = np.random.default_rng(11)
+    customers = generate_customers(30, rng)
+    products = generate_products(15, rng)
+    metadata = generate_streaming(1000, customers, products, output_dir=str(tmp_path), chunk_size=300, seed=11)
+
+    transactions = pd.concat(pd.read_csv(p["path"]) for p in metadata["partitions"]["transactions"])
+    items = pd.concat(pd.read_csv(p["path"]) for p in metadata["partitions"]["transaction_items"])
+
+    assert len(transactions) == metadata["transactions"] == 1000
+    assert transactions["transaction_id"].is_unique
+    assert len(items) == metadata["transaction_items"]
+
+    # Every partition only holds its own month, for parents and children alike
+    for entry in metadata["partitions"]["transactions"]:
+        part = pd.read_csv(entry["path"])
+        assert (part["transaction_date"].str[:7] == entry["partition"]).all()
+        assert len(part) == entry["rows"]
+
+
+
+def test_streaming_fk_flag_reflects_generated_ids(tmp_path, monkeypatch):
+    import scripts.data_generation.generate_data as gd
+
+    rng = np.random.default_rng(3)
+    customers = gd.generate_customers(10, rng)
+    products = gd.generate_products(5, rng)
+    metadata = gd.generate_streaming(50, customers, products, output_dir=str(tmp_path / "ok"), seed=3)
+    assert metadata["transaction_fk_valid"]
+
+    original = gd.generate_transaction_items
+
+    def with_orphan(*args, **kwargs):
+        items = original(*args, **kwargs)
+        items.loc[items.index[0], "transaction_id"] = "TXN99999999"
+        return items
+
+    monkeypatch.setattr(gd, "generate_transaction_items", with_orphan)
+    metadata = gd.generate_streaming(50, customers, products, output_dir=str(tmp_path / "bad"), seed=3)
+    assert not metadata["transaction_fk_valid"]
+
+
+def test_sharded_generation_is_reproducible(tmp_path):
+    from scripts.data_generation.generate_data import main
+
+    for run in ("a", "b"):
+        main(["--seed", "5", "--workers", "2", "--transactions", "400", "--chunk-size", "150",
+              "--as-of", "2025-06-30", "--output-dir", str(tmp_path / run)])
+
+    for name in ("customers.csv", "products.csv", "transactions.csv", "transaction_items.csv"):
+        assert (tmp_path / "a" / name).read_bytes() == (tmp_path / "b" / name).read_bytes()
+
+    transactions = pd.read_csv(tmp_path / "a" / "transactions.csv")
+    customers = pd.read_csv(tmp_path / "a" / "customers.csv")
+    assert transactions["transaction_id"].is_unique and len(transactions) == 400
+    assert transactions["customer_id"].isin(customers["customer_id"]).all()
+
+
+def test_parquet_output_matches_csv(tmp_path):
+    import pytest
+    pq = pytest.importorskip("pyarrow.parquet")
+    from scripts.data_generation.generate_data import main
+
+    main(["--seed", "9", "--format", "both", "--transactions", "200", "--output-dir", str(tmp_path)])
+
+    schema = pq.read_schema(tmp_path / "transactions.parquet")
+    assert str(schema.field("transaction_date").type) == "date32[day]"
+
+    from_parquet = pd.read_parquet(tmp_path / "transaction_items.parquet")
+    from_csv = pd.read_csv(tmp_path / "transaction_items.csv")
+    assert from_parquet["transaction_id"].tolist() == from_csv["transaction_id"].tolist()
+    assert np.allclose(from_parquet["line_total"], from_csv["line_total"])
+
+
+def test_scale_factor_sizes_and_cache(tmp_path):
+    from scripts.data_generation.generate_data import scale_cardinalities, build_benchmark_dataset
+
+    config = {
+        "customer_count": 1000, "product_count": 500,
+        "transaction_count": 10000, "transaction_item_count": 20000,
+        "benchmark": {"as_of": "2025-12-31", "cache_dir": str(tmp_path / "cache")}
+    }
+    assert scale_cardinalities(1, config) == {
+        "customers": 1000, "products": 500, "transactions": 10000, "max_items": 3
+    }
+    assert scale_cardinalities(0.01, config)["transactions"] == 100
+
+    first = build_benchmark_dataset(0.01, 3, output_dir=str(tmp_path / "raw1"), config=config)
+    second = build_benchmark_dataset(0.01, 3, output_dir=str(tmp_path / "raw2"), config=config)
+
+    assert first["fingerprint"] == second["fingerprint"]
+    assert (tmp_path / "raw2" / "transactions.csv").read_bytes() == \
+        (tmp_path / "cache" / "sf0.01_seed3" / "transactions.csv").read_bytes()
+
+
+def test_benchmark_cache_survives_raw_rewrites_and_detects_corruption(tmp_path):
+    import pandas as pd
+    from scripts.data_generation.generate_data import build_benchmark_dataset, write_table
+
+    config = {
+        "customer_count": 1000, "product_count": 500,
+        "transaction_count": 10000, "transaction_item_count": 20000,
+        "benchmark": {"as_of": "2025-12-31", "cache_dir": str(tmp_path / "cache")}
+    }
+    cached_file = tmp_path / "cache" / "sf0.01_seed3" / "customers.csv"
+    raw = tmp_path / "raw"
+
+    first = build_benchmark_dataset(0.01, 3, output_dir=str(raw), config=config)
+    original = cached_file.read_bytes()
+
+    # A plain generation run rewrites the raw files in place
+    write_table(pd.DataFrame({"customer_id": [1]}), "customers", str(raw), ["csv"])
+    assert cached_file.read_bytes() == original
+
+    # A cache whose contents no longer match its fingerprint is rebuilt
+    cached_file.write_text("customer_id\n1\n")
+    second = build_benchmark_dataset(0.01, 3, output_dir=str(raw), config=config)
+    assert second["fingerprint"] == first["fingerprint"]
+    assert cached_file.read_bytes() == original
+    assert (raw / "customers.csv").read_bytes() == original
+
+
+def test_zipf_profile_concentrates_product_popularity():
+    from scripts.data_generation.generate_data import (
+        generate_customers, generate_products, generate_transactions,
+        generate_transaction_items, resolve_profile
+    )
+
+    rng = np.random.default_rng(3)
+    customers = generate_customers(100, rng)
+    products = generate_products(200, rng)
+    profile = resolve_profile({"products": {"distribution": "zipf", "exponent": 1.5}}, 100, 200, seed=3)
+
+    transactions = generate_transactions(2000, customers, rng, profile=profile)
+    items = generate_transaction_items(transactions, products, rng, profile=profile)
+
+    # Uniform popularity would give the top product well under 2% of items
+    top_share = items["product_id"].value_counts().iloc[0] / len(items)
+    assert top_share > 0.1
+    assert not items.duplicated(["transaction_id", "product_id"]).any()
+
+
+def test_streaming_integrity_validator_reports_orphans(tmp_path):
+    from scripts.data_generation.generate_data import validate_referential_integrity_streaming
+
+    pd.DataFrame({"customer_id": ["CUST00001", "CUST00002"]}).to_csv(tmp_path / "customers.csv", index=False)
+    pd.DataFrame({"product_id": ["PROD00001"]}).to_csv(tmp_path / "products.csv", index=False)
+    pd.DataFrame({
+        "transaction_id": ["TXN000001", "TXN000002", "TXN000003"],
+        "customer_id": ["CUST00001", "CUST00009", "bogus"]
+    }).to_csv(tmp_path / "transactions.csv", index=False)
+    pd.DataFrame({
+        "transaction_id": ["TXN000001", "TXN000004"],
+        "product_id": ["PROD00001", "PROD00001"]
+    }).to_csv(tmp_path / "transaction_items.csv", index=False)
+
+    report = validate_referential_integrity_streaming(str(tmp_path), chunk_size=1)
+
+    customers_fk = report["relationships"]["transactions.customer_id -> customers.customer_id"]
+    assert customers_fk["orphan_rows"] == 2
+    assert customers_fk["orphan_sample"] == ["CUST00009", "bogus"]
+    assert report["product_fk_valid"] and not report["customer_fk_valid"] and not report["transaction_fk_valid"]
+
+
+def test_streaming_validator_matches_ids_exactly(tmp_path):
+    from scripts.data_generation.generate_data import (
+        validate_referential_integrity, validate_referential_integrity_streaming
+    )
+
+    pd.DataFrame({"customer_id": ["CUST00001", "CUST00040", "C-7"]}).to_csv(tmp_path / "customers.csv", index=False)
+    pd.DataFrame({"product_id": ["PROD00001"]}).to_csv(tmp_path / "products.csv", index=False)
+    pd.DataFrame({
+        "transaction_id": ["TXN000001", "TXN000002", "TXN000003", "TXN000004", "TXN000005"],
+        "customer_id": ["CUST1", "CUST 1", "CUST4e1", "CUST00040", "C-7"]
+    }).to_csv(tmp_path / "transactions.csv", index=False)
+    pd.DataFrame({
+        "transaction_id": ["TXN1.0", "TXN000001"],
+        "product_id": ["PROD1", "PROD00001"]
+    }).to_csv(tmp_path / "transaction_items.csv", index=False)
+
+    report = validate_referential_integrity_streaming(str(tmp_path), chunk_size=2)
+    expected = validate_referential_integrity(
+        *(pd.read_csv(tmp_path / f"{t}.csv", dtype=str)
+          for t in ["customers", "products", "transactions", "transaction_items"])
+    )
+
+    for flag in ("customer_fk_valid", "product_fk_valid", "transaction_fk_valid"):
+        assert report[flag] is expected[flag] is False
+    customers_fk = report["relationships"]["transactions.customer_id -> customers.customer_id"]
+    assert customers_fk["orphan_sample"] == ["CUST1", "CUST 1", "CUST4e1"]
+    assert report["parent_key_sets"]["customers"]["exact_keys"] == 1
+
+def test_compact_key_set_is_built_chunk_by_chunk():
+    from scripts.data_generation.generate_data import CompactKeySet
+
+    keys = CompactKeySet()
+    for chunk in np.array_split(np.arange(1, 10_001), 7):
+        keys.add(chunk)
+    keys.add(np.array([5, 5, -1]))
+    assert keys.kind == "bitmap" and keys.size == 10_000
+    assert keys.nbytes < 2 * 10_001 / 8 + 1
+    assert keys.contains(np.array([0, 1, 10_000, 10_001, -1])).tolist() == [False, True, True, False, False]
+
+    # One far-off ID would make the bitmap sparse, so it becomes a sorted array
+    keys.add(np.array([10**12]))
+    assert keys.kind == "sorted_array" and keys.size == 10_001
+    assert keys.contains(np.array([1, 10_000, 10_001, 10**12])).tolist() == [True, True, False, True]
+
+def test_streamed_dataset_metadata_carries_the_validator_report(tmp_path):
+    from datetime import date
+    from scripts.data_generation.generate_data import generate_dataset
+
+    metadata = generate_dataset(str(tmp_path), 20, 10, 200, seed=9, as_of=date(2025, 6, 30),
+                                formats=["csv"], stream=True, chunk_size=80)
+
+    report = metadata["referential_integrity"]
+    assert all(r["valid"] for r in report["relationships"].values())
+    for flag in ("customer_fk_valid", "product_fk_valid", "transaction_fk_valid"):
+        assert metadata[flag] is report[flag] is True
@@ -0,0 +1,31 @@
+from sqlalchemy import create_engine, text
+
+
+def test_settings_precedence(tmp_path):
+    from scripts.db import db_settings, database_url
+
+    config = tmp_path / "config.yaml"
+    config.write_text("database:\n  db_name: from_config\n  port: 6000\n  pool_size: 2\n")
+
+    settings = db_settings(str(config), environ={"DB_PORT": "7000", "DB_USER": "etl"})
+    assert settings["db_name"] == "from_config"
+    assert settings["port"] == 7000 and settings["pool_size"] == 2
+    assert settings["user"] == "etl"
+    assert database_url(settings).port == 7000
+
+
+def test_connection_metrics_are_recorded_per_stage():
+    from scripts.db import instrument, stage, connection_metrics, reset_metrics
+
+    reset_metrics()
+    engine = instrument(create_engine("sqlite://"))
+    with stage("unit_stage"):
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+    usage = connection_metrics("unit_stage")
+    assert usage["checkouts"] == 3
+    assert usage["connections_opened"] == 1
+    assert usage["peak_in_use"] == 1 and usage["in_use"] == 0
+    assert "default" not in connection_metrics()
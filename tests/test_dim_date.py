@@ -0,0 +1,23 @@
+from datetime import date
+
+
+def test_build_dim_date_attributes():
+    from scripts.transformation.load_dim_date import build_dim_date
+
+    df = build_dim_date(date(2024, 12, 30), date(2025, 1, 5))
+    assert len(df) == 7
+    first = df.iloc[0]
+    assert first["date_key"] == date(2024, 12, 30)
+    assert (first["year"], first["quarter"], first["month"], first["day"]) == (2024, 4, 12, 30)
+    assert first["month_name"] == "December" and first["day_name"] == "Monday"
+    # ISO week 1 of 2025 starts on Monday 2024-12-30
+    assert first["week_of_year"] == 1
+    assert df["is_weekend"].tolist() == [False, False, False, False, False, True, True]
+
+
+def test_build_dim_date_integer_keys():
+    from scripts.transformation.load_dim_date import build_dim_date
+
+    df = build_dim_date(date(2024, 2, 28), date(2024, 3, 1), integer_key=True)
+    assert df["date_key"].tolist() == [20240228, 20240229, 20240301]
+    assert df["full_date"].tolist() == [date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]
@@ -1,6 +1,11 @@
 import os
+import datetime
+import pandas as pd
 import pytest
-import psycopg2
+from sqlalchemy import text
+from scripts.db import get_engine, raw_connection
+import scripts.ingestion.ingest_to_staging as ingest
+from scripts.ingestion.ingest_to_staging import copy_file, load_shadow_table, swap_shadow_tables
 import pytest
 
 pytestmark = pytest.mark.db
@@ -8,18 +13,11 @@ pytestmark = pytest.mark.db
 
 import os
 
-DB_CONFIG = {
-    "host": "localhost",
-    "port": 5433,
-    "dbname": "ecommerce_db",
-    "user": "admin",
-    "password": "password"
-}
 
 
 
 def test_fact_table_exists():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = raw_connection()
     cur = conn.cursor()
 
     cur.execute("""
@@ -35,7 +33,7 @@ def test_fact_table_exists():
     conn.close()
 
 def test_fact_grain_matches_transaction_items():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = raw_connection()
     cur = conn.cursor()
 
     cur.execute("SELECT COUNT(*) FROM warehouse.fact_sales")
@@ -46,3 +44,113 @@ def test_fact_grain_matches_transaction_items():
 
     assert fact_count == item_count
     conn.close()
+
+def test_copy_matches_the_insert_path(db_conn, tmp_path):
+    rows = (
+        "customer_id,name,email,phone,address,signup_date\n"
+        'CUST1,"Smith, Jane",jane@example.com,555-0100,"12 ""Oak"" St\nApt 4",2024-01-05\n'
+        "CUST2,Bob,,555-0101,,2024-02-29\n"
+        "CUST3,,bob@example.com,,1 Main St,\n"
+    )
+    # The streamed path, and a file with an extra column that has to be re-encoded
+    plain = tmp_path / "customers.csv"
+    plain.write_text(rows)
+    extra = tmp_path / "customers_extra.csv"
+    extra.write_text(
+        "segment,customer_id,name,email,phone,address,signup_date\n"
+        'a,CUST1,"Smith, Jane",jane@example.com,555-0100,"12 ""Oak"" St\nApt 4",2024-01-05\n'
+        "b,CUST2,Bob,,555-0101,,2024-02-29\n"
+        ",CUST3,,bob@example.com,,1 Main St,\n"
+    )
+
+    columns = ["customer_id", "name", "email", "phone", "address", "signup_date"]
+    select = f"SELECT {', '.join(columns)} FROM staging.{{}} ORDER BY customer_id"
+    for table in ("customers_insert", "customers_copy", "customers_copy_extra"):
+        db_conn.execute(text(f"CREATE TABLE staging.{table} (LIKE staging.customers INCLUDING ALL)"))
+
+    # The original loader: pandas parses the file and inserts the rows
+    pd.read_csv(plain).to_sql("customers_insert", db_conn, schema="staging",
+                              if_exists="append", index=False, method="multi")
+    cursor = db_conn.connection.cursor()
+    staging = set(columns) | {"loaded_at"}
+    assert copy_file(cursor, "customers_copy", str(plain), staging)[0] == 3
+    assert copy_file(cursor, "customers_copy_extra", str(extra), staging)[0] == 3
+
+    expected = db_conn.execute(text(select.format("customers_insert"))).fetchall()
+    assert db_conn.execute(text(select.format("customers_copy"))).fetchall() == expected
+    assert db_conn.execute(text(select.format("customers_copy_extra"))).fetchall() == expected
+
+    assert len(expected) == 3
+    assert expected[0].name == "Smith, Jane"
+    assert expected[0].address == '12 "Oak" St\nApt 4'
+    assert expected[0].signup_date == datetime.date(2024, 1, 5)
+    assert expected[1].email is None and expected[1].address is None
+    assert expected[2].name is None and expected[2].signup_date is None
+
+def test_shadow_swap_publishes_rows_and_keeps_index_names(tmp_path):
+    indexes = text("SELECT indexname FROM pg_indexes WHERE schemaname = 'staging' AND tablename = 'swap_probe'")
+
+    engine = get_engine()
+    path = tmp_path / "swap_probe.csv"
+    path.write_text("probe_id,label\n1,new\n2,newer\n")
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS staging.swap_probe"))
+        conn.execute(text("CREATE TABLE staging.swap_probe (probe_id INTEGER, label TEXT, "
+                          "loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"))
+        conn.execute(text("INSERT INTO staging.swap_probe (probe_id, label) VALUES (0, 'old')"))
+        conn.execute(text("CREATE INDEX idx_stg_swap_probe_loaded_at ON staging.swap_probe(loaded_at)"))
+    try:
+        stats, _ = load_shadow_table(engine, "swap_probe", [(str(path), 0)])
+        assert stats["rows_loaded"] == 2
+        swap_shadow_tables(engine, ["swap_probe"])
+
+        # Re-running the staging DDL must find the index under its own name
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_stg_swap_probe_loaded_at ON staging.swap_probe(loaded_at)"
+            ))
+            assert conn.execute(indexes).scalars().all() == ["idx_stg_swap_probe_loaded_at"]
+            assert conn.execute(text(
+                "SELECT label FROM staging.swap_probe ORDER BY probe_id"
+            )).scalars().all() == ["new", "newer"]
+            assert conn.execute(text(
+                "SELECT COUNT(*) FROM pg_tables WHERE schemaname = 'staging' AND tablename LIKE 'swap_probe\\_\\_%'"
+            )).scalar() == 0
+
+        # Appended rows go into the live table, which keeps its indexes
+        stats, _ = load_shadow_table(engine, "swap_probe", [(str(path), 0)])
+        swap_shadow_tables(engine, [], ["swap_probe"])
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM staging.swap_probe")).scalar() == 4
+            assert conn.execute(indexes).scalars().all() == ["idx_stg_swap_probe_loaded_at"]
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS staging.swap_probe"))
+            conn.execute(text("DROP TABLE IF EXISTS staging.swap_probe__shadow"))
+
+def test_manifest_staleness_uses_storage_ids_instead_of_counting(monkeypatch):
+    engine = get_engine()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS staging.stale_probe"))
+        conn.execute(text("CREATE TABLE staging.stale_probe AS SELECT 1 AS id"))
+    try:
+        storage_id = ingest.staging_storage_ids(engine, ["stale_probe"])["stale_probe"]
+        previous = {"files": {}, "rows": 1, "relfilenode": storage_id}
+
+        def no_count(engine, table):
+            raise AssertionError("staging table scanned")
+        monkeypatch.setattr(ingest, "staging_row_count", no_count)
+        ids = ingest.staging_storage_ids(engine, ["stale_probe"])
+        assert not ingest.manifest_is_stale(engine, "stale_probe", previous, ids)
+
+        with engine.begin() as conn:
+            conn.execute(text("TRUNCATE staging.stale_probe"))
+        ids = ingest.staging_storage_ids(engine, ["stale_probe"])
+        assert ingest.manifest_is_stale(engine, "stale_probe", previous, ids)
+
+        # Manifests from before storage ids fall back to the row count
+        monkeypatch.undo()
+        assert ingest.manifest_is_stale(engine, "stale_probe", {"files": {}, "rows": 1}, ids)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS staging.stale_probe"))
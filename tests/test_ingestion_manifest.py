@@ -0,0 +1,31 @@
+def test_plan_detects_unchanged_appended_and_rewritten_files(tmp_path):
+    from scripts.ingestion.ingest_to_staging import plan_table_load
+
+    path = tmp_path / "transactions.csv"
+    path.write_text("transaction_id,customer_id\nTXN1,CUST1\nTXN2,CUST2\n")
+    files = [str(path)]
+
+    mode, parts, entries = plan_table_load("transactions", files, None)
+    assert mode == "full" and parts == [(str(path), 0)]
+    for entry in entries.values():
+        entry["rows"] = 2
+    previous = {"files": entries, "rows": 2}
+
+    mode, parts, _ = plan_table_load("transactions", files, previous)
+    assert mode == "skipped" and parts == []
+
+    # Rows appended to an append-only file are loaded from the old end offset
+    old_size = path.stat().st_size
+    with open(path, "a") as f:
+        f.write("TXN3,CUST3\n")
+    mode, parts, _ = plan_table_load("transactions", files, previous)
+    assert mode == "append" and parts == [(str(path), old_size)]
+
+    # The same growth on a table that is not append-only forces a reload
+    mode, _, _ = plan_table_load("customers", files, previous)
+    assert mode == "full"
+
+    # Rewriting an existing row is not an append
+    path.write_text("transaction_id,customer_id\nTXN1,CUST9\nTXN2,CUST2\nTXN3,CUST3\n")
+    mode, parts, _ = plan_table_load("transactions", files, previous)
+    assert mode == "full" and parts == [(str(path), 0)]
@@ -0,0 +1,17 @@
+import pandas as pd
+
+DATA_PATH = "data/raw"
+
+
+def test_typed_loading_is_compact():
+    from scripts.schemas import apply_schema, memory_footprint
+
+    items = apply_schema(pd.read_csv(f"{DATA_PATH}/transaction_items.csv"), "transaction_items")
+    assert str(items["quantity"].dtype) == "Int16"
+    assert str(items["product_id"].dtype) == "category"
+
+    untyped = pd.read_csv(f"{DATA_PATH}/transactions.csv")
+    transactions = apply_schema(untyped.copy(), "transactions")
+    assert str(transactions["transaction_date"].dtype).startswith("datetime64")
+    assert memory_footprint(transactions) < memory_footprint(untyped)
+
@@ -1,5 +1,8 @@
 import os
-import psycopg2
+from sqlalchemy import text
+from scripts.db import get_engine, raw_connection
+import scripts.transformation.staging_to_production as stp
+from scripts.transformation.staging_to_production import transform_all, transform_incremental, TARGET_COLUMNS
 import pytest
 
 pytestmark = pytest.mark.db
@@ -7,17 +10,10 @@ pytestmark = pytest.mark.db
 
 import os
 
-DB_CONFIG = {
-    "host": "localhost",
-    "port": 5433,
-    "dbname": "ecommerce_db",
-    "user": "admin",
-    "password": "password"
-}
 
 
 def test_no_orphan_transactions():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = raw_connection()
     cur = conn.cursor()
 
     cur.execute("""
@@ -34,7 +30,7 @@ def test_no_orphan_transactions():
     conn.close()
 
 def test_product_price_positive():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = raw_connection()
     cur = conn.cursor()
 
     cur.execute("""
@@ -47,3 +43,62 @@ def test_product_price_positive():
 
     cur.close()
     conn.close()
+
+def test_sql_pushdown_matches_pandas_path(db_conn):
+    # Audit columns default to now(), so only the transformed columns are compared
+    snapshot = "SELECT {0} FROM production.{1} ORDER BY {0}"
+    results = {}
+    for mode in ["sql", "pandas"]:
+        # Each run truncates production first, so both start from the same state.
+        # A small batch size makes the pandas path stream several cursor batches
+        transform_all(db_conn, mode, batch_size=100)
+        results[mode] = {
+            t: db_conn.execute(text(snapshot.format(", ".join(TARGET_COLUMNS[t]), t))).fetchall()
+            for t in ["customers", "products", "transactions", "transaction_items"]
+        }
+
+    assert results["sql"] == results["pandas"]
+
+def test_incremental_mode_upserts_only_new_staging_rows(db_conn):
+    transform_all(db_conn, "sql")
+
+    # Nothing staged since the full rebuild
+    records = transform_incremental(db_conn)
+    assert all(r["input"] == 0 for r in records.values())
+
+    db_conn.execute(text("""
+        UPDATE staging.transactions
+        SET payment_method = 'Gift Card', loaded_at = loaded_at + INTERVAL '1 day'
+        WHERE transaction_id = (SELECT MIN(transaction_id) FROM staging.transactions)
+    """))
+    records = transform_incremental(db_conn)
+    assert records["transactions"]["input"] == 1
+    assert records["transactions"]["updated"] == 1
+    assert records["customers"]["input"] == 0
+
+def test_failed_parallel_rebuild_is_recovered_by_the_next_incremental_run(monkeypatch, tmp_path):
+    engine = get_engine()
+    count = text("SELECT COUNT(*) FROM production.transaction_items")
+    with engine.connect() as conn:
+        items = conn.execute(count).scalar()
+
+    def failing_transform_table(conn, table, mode="sql", batch_size=None):
+        if table == "transaction_items":
+            raise RuntimeError("item load failed")
+        return transform_table(conn, table, mode, batch_size)
+
+    transform_table = stp.transform_table
+    monkeypatch.setattr(stp, "transform_table", failing_transform_table)
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(RuntimeError):
+        stp.run("sql", engine=engine, workers=4)
+
+    # The failed table is empty and has no watermark to skip staging rows with
+    with engine.connect() as conn:
+        assert conn.execute(count).scalar() == 0
+        assert stp.get_watermark(conn, "transaction_items") is None
+
+    monkeypatch.setattr(stp, "transform_table", transform_table)
+    stp.run("incremental", engine=engine, workers=1)
+    with engine.connect() as conn:
+        assert conn.execute(count).scalar() == items
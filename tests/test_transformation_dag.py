@@ -0,0 +1,154 @@
+import threading
+import time
+
+
+def test_dag_runs_independent_tasks_concurrently_and_respects_dependencies():
+    from scripts.transformation.staging_to_production import run_dag, critical_path
+
+    dependencies = {"a": [], "b": [], "c": ["a"], "d": ["b", "c"]}
+    finished, lock = [], threading.Lock()
+
+    def task(name, seconds):
+        def fn():
+            time.sleep(seconds)
+            with lock:
+                finished.append(name)
+            return name.upper()
+        return fn
+
+    tasks = {"a": task("a", 0.05), "b": task("b", 0.2), "c": task("c", 0.05), "d": task("d", 0.01)}
+    results, timings = run_dag(tasks, dependencies, max_workers=4)
+
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+    # a and b start together; d waits for both of its parents
+    assert abs(timings["a"]["start_offset_seconds"] - timings["b"]["start_offset_seconds"]) < 0.05
+    assert timings["d"]["start_offset_seconds"] >= timings["b"]["end_offset_seconds"]
+    assert finished[-1] == "d"
+
+    path, seconds = critical_path(timings, dependencies)
+    assert path == ["b", "d"]
+    assert seconds >= 0.2
+
+
+def test_dag_raises_the_first_failure_and_skips_dependents():
+    import pytest
+    from scripts.transformation.staging_to_production import run_dag
+
+    started = []
+
+    def ok(name):
+        def fn():
+            started.append(name)
+            return name
+        return fn
+
+    def fail():
+        started.append("b")
+        raise RuntimeError("boom")
+
+    tasks = {"a": ok("a"), "b": fail, "c": ok("c")}
+    with pytest.raises(RuntimeError, match="boom"):
+        run_dag(tasks, {"c": ["b"]}, max_workers=2)
+    assert "c" not in started
+
+
+def test_dag_rejects_unsatisfiable_dependencies():
+    import pytest
+    from scripts.transformation.staging_to_production import run_dag
+
+    with pytest.raises(ValueError, match="Unsatisfiable"):
+        run_dag({"a": lambda: 1}, {"a": ["missing"]}, max_workers=1)
+
+
+def test_dag_with_one_worker_runs_tasks_one_after_another():
+    from scripts.transformation.staging_to_production import run_dag
+
+    tasks = {name: (lambda: time.sleep(0.02)) for name in "abc"}
+    _, timings = run_dag(tasks, {}, max_workers=1)
+
+    spans = sorted((t["start_offset_seconds"], t["end_offset_seconds"]) for t in timings.values())
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert start >= end
+
+
+def test_critical_path_follows_the_longest_dependency_chain():
+    from scripts.transformation.staging_to_production import critical_path, DEPENDENCIES
+
+    def span(start, end):
+        return {"start_offset_seconds": start, "end_offset_seconds": end, "duration_seconds": end - start}
+
+    timings = {
+        "customers": span(0.0, 0.5),
+        "products": span(0.0, 2.0),
+        "transactions": span(0.5, 1.5),
+        "transaction_items": span(2.0, 2.5)
+    }
+    path, seconds = critical_path(timings, DEPENDENCIES)
+    assert path == ["products", "transaction_items"]
+    assert seconds == 2.5
+
+    # With a slow transactions step the chain through customers dominates
+    timings["transactions"] = span(0.5, 3.0)
+    timings["transaction_items"] = span(3.0, 3.5)
+    path, seconds = critical_path(timings, DEPENDENCIES)
+    assert path == ["customers", "transactions", "transaction_items"]
+    assert seconds == 3.5
+
+
+def _stub_units(monkeypatch, module, calls):
+    """Replaces the database work of each table unit with a short sleep."""
+    monkeypatch.setattr(module, "truncate_production", lambda conn: calls.append("truncate"))
+    monkeypatch.setattr(module, "ensure_incremental_objects", lambda conn: calls.append("ensure"))
+
+    def unit(engine, table, mode, batch_size):
+        time.sleep(0.02)
+        calls.append(table)
+        return {"input": 1, "output": 1, "mode": mode, "batch_size": batch_size}
+
+    monkeypatch.setattr(module, "_run_unit", unit)
+
+
+def test_transform_parallel_runs_units_in_dependency_order(monkeypatch):
+    from sqlalchemy import create_engine
+    import scripts.transformation.staging_to_production as stp
+
+    calls = []
+    _stub_units(monkeypatch, stp, calls)
+    records, execution = stp.transform_parallel(create_engine("sqlite://"), "sql", batch_size=10, workers=4)
+
+    assert calls[:2] == ["ensure", "truncate"]
+    order = calls[2:]
+    assert order.index("transactions") > order.index("customers")
+    assert order[-1] == "transaction_items"
+    assert list(records) == stp.TABLE_ORDER
+    assert records["customers"]["batch_size"] == 10
+    assert execution["workers"] == 4
+    assert execution["critical_path"][-1] == "transaction_items"
+    assert set(execution["tasks"]) == set(stp.TABLE_ORDER)
+    assert execution["sum_task_seconds"] >= execution["critical_path_seconds"]
+
+
+def test_incremental_parallel_run_keeps_production_and_writes_summary(monkeypatch, tmp_path):
+    import json
+    from sqlalchemy import create_engine
+    import scripts.transformation.staging_to_production as stp
+
+    calls = []
+    _stub_units(monkeypatch, stp, calls)
+    monkeypatch.chdir(tmp_path)
+    summary = stp.run("incremental", engine=create_engine("sqlite://"), batch_size=5, workers=2)
+
+    assert "truncate" not in calls
+    assert summary["mode"] == "incremental"
+    assert summary["execution"]["workers"] == 2
+    with open(tmp_path / stp.SUMMARY_FILE) as f:
+        assert json.load(f)["records_processed"]["transactions"]["mode"] == "incremental"
+
+
+def test_parse_args_defaults():
+    from scripts.transformation.staging_to_production import parse_args, TABLE_ORDER
+
+    args = parse_args([])
+    assert args.mode == "sql" and not args.benchmark
+    assert args.workers == len(TABLE_ORDER) and args.batch_size is None
+    assert parse_args(["--mode", "incremental", "--workers", "1"]).workers == 1
@@ -0,0 +1,61 @@
+import pandas as pd
+
+
+def test_clean_customers_normalizes_email_and_splits_names():
+    from scripts.transformation.staging_to_production import clean_customers
+
+    df = clean_customers(pd.DataFrame({
+        "email": ["  Ann.Lee@Example.COM ", "bob@x.org"],
+        "name": [" Ann Marie Lee ", "Bob"]
+    }))
+    assert df["email"].tolist() == ["ann.lee@example.com", "bob@x.org"]
+    assert df["first_name"].tolist() == ["Ann", "Bob"]
+    assert df["last_name"].tolist()[0] == "Marie Lee"
+    assert pd.isna(df["last_name"].tolist()[1])
+
+
+def test_enrich_products_matches_the_sql_price_bands():
+    from scripts.transformation.staging_to_production import enrich_products, PROFIT_MARGIN
+
+    df = enrich_products(pd.DataFrame({"price": [0.0, 49.99, 50.0, 199.99, 200.0]}))
+    assert df["price_category"].astype(str).tolist() == [
+        "Budget", "Budget", "Mid-range", "Mid-range", "Premium"
+    ]
+    assert (df["profit_margin"] == PROFIT_MARGIN).all()
+
+
+def test_benchmark_rolls_back_every_run_and_reports_speedup(monkeypatch, tmp_path):
+    import json
+    from sqlalchemy import create_engine
+    import scripts.transformation.staging_to_production as stp
+
+    seen = []
+
+    def fake_transform_all(conn, mode, batch_size):
+        seen.append(mode)
+        return {"customers": {"output": 10, "duration_seconds": 0.01}}
+
+    monkeypatch.setattr(stp, "transform_all", fake_transform_all)
+    monkeypatch.chdir(tmp_path)
+    report = stp.benchmark(repeats=2, engine=create_engine("sqlite://"))
+
+    assert seen == ["sql", "sql", "pandas", "pandas"]
+    assert report["modes"]["sql"]["rows_written"] == 10
+    assert len(report["modes"]["pandas"]["runs_seconds"]) == 2
+    with open(tmp_path / stp.BENCHMARK_FILE) as f:
+        assert set(json.load(f)["modes"]) == {"sql", "pandas"}
+
+
+def test_single_worker_run_uses_one_transaction(monkeypatch, tmp_path):
+    from sqlalchemy import create_engine
+    import scripts.transformation.staging_to_production as stp
+
+    monkeypatch.setattr(stp, "transform_all", lambda conn, mode, batch_size: {"customers": {"mode": mode}})
+    monkeypatch.setattr(stp, "transform_incremental", lambda conn: {"customers": {"mode": "incremental"}})
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine("sqlite://")
+
+    assert stp.run("pandas", engine=engine, workers=1)["records_processed"]["customers"]["mode"] == "pandas"
+    summary = stp.run("incremental", engine=engine, workers=1)
+    assert summary["records_processed"]["customers"]["mode"] == "incremental"
+    assert "execution" not in summary
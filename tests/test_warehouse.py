@@ -1,22 +1,27 @@
 import os
-import psycopg2
+from datetime import date
+from sqlalchemy import text
+from scripts.db import raw_connection
+from scripts.transformation.load_dim_date import load_dim_date
 import pytest
 
 pytestmark = pytest.mark.db
 
+
+@pytest.fixture(scope="module")
+def lw():
+    # Not imported at module top: the non-db run still collects this file and
+    # would measure load_warehouse without exercising it
+    import scripts.transformation.load_warehouse as lw
+    return lw
+
+
 import os
 
-DB_CONFIG = {
-    "host": "localhost",
-    "port": 5433,
-    "dbname": "ecommerce_db",
-    "user": "admin",
-    "password": "password"
-}
 
 
 def test_fact_table_exists():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = raw_connection()
     cur = conn.cursor()
 
     cur.execute("""
@@ -34,7 +39,7 @@ def test_fact_table_exists():
     conn.close()
 
 def test_fact_grain_matches_transaction_items():
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = raw_connection()
     cur = conn.cursor()
 
     cur.execute("SELECT COUNT(*) FROM warehouse.fact_sales")
@@ -47,3 +52,166 @@ def test_fact_grain_matches_transaction_items():
 
     cur.close()
     conn.close()
+
+def test_scd2_merge_expires_changed_rows_and_inserts_new_versions(lw, db_conn):
+    lw.merge_scd2(db_conn, "dim_products", date(2030, 1, 1))
+    product_id = db_conn.execute(text("SELECT MIN(product_id) FROM production.products")).scalar()
+    db_conn.execute(text("UPDATE production.products SET price = price + 1 WHERE product_id = :id"),
+                    {"id": product_id})
+
+    counts = lw.merge_scd2(db_conn, "dim_products", date(2030, 1, 2))
+    assert counts["changed"] == 1 and counts["new"] == 0
+    versions = db_conn.execute(text(
+        "SELECT is_current, end_date FROM warehouse.dim_products "
+        "WHERE product_id = :id AND effective_date >= '2030-01-01' ORDER BY dw_product_id"
+    ), {"id": product_id}).fetchall()
+    assert versions[-1] == (True, None)
+    assert db_conn.execute(text(
+        "SELECT COUNT(*) FROM warehouse.dim_products WHERE product_id = :id AND is_current"
+    ), {"id": product_id}).scalar() == 1
+
+def test_row_hash_ignores_untracked_columns(lw, db_conn):
+    lw.merge_scd2(db_conn, "dim_products", date(2030, 1, 1))
+    # category is stored on the dimension but not tracked
+    db_conn.execute(text("UPDATE production.products SET category = category || '_x'"))
+    counts = lw.merge_scd2(db_conn, "dim_products", date(2030, 1, 2))
+    assert counts["changed"] == 0 and counts["new"] == 0
+
+    tracked = ["product_name", "price", "cost"]
+    assert db_conn.execute(text(
+        f"SELECT COUNT(*) FROM warehouse.dim_products d JOIN production.products p "
+        f"ON p.product_id = d.product_id AND d.is_current "
+        f"WHERE d.row_hash <> {lw.row_hash_sql(tracked, 'p')}"
+    )).scalar() == 0
+
+def test_row_hash_keeps_null_apart_from_every_value(lw, db_conn):
+    rows = [("N", "x"), (None, "x"), ("", "x"), ("\\N", "x"), ("a", None), (None, "a")]
+    db_conn.execute(text("CREATE TEMP TABLE hash_probe (a TEXT, b TEXT) ON COMMIT DROP"))
+    db_conn.execute(text("INSERT INTO hash_probe VALUES (:a, :b)"), [{"a": a, "b": b} for a, b in rows])
+    hashes = db_conn.execute(text(f"SELECT {lw.row_hash_sql(['a', 'b'], 'h')} FROM hash_probe h")).scalars().all()
+    assert len(set(hashes)) == len(rows)
+
+    # Hashes stored under an older format are recomputed, not taken as changes
+    lw.merge_scd2(db_conn, "dim_products", date(2030, 1, 1))
+    db_conn.execute(text("UPDATE warehouse.dim_products SET row_hash = md5('stale')"))
+    db_conn.execute(text("COMMENT ON COLUMN warehouse.dim_products.row_hash IS NULL"))
+    counts = lw.merge_scd2(db_conn, "dim_products", date(2030, 1, 2))
+    assert counts["changed"] == 0 and counts["new"] == 0
+
+def test_incremental_fact_load_matches_full_rebuild(lw, db_conn):
+    lw.load_fact_sales(db_conn, "full")
+    assert lw.verify_fact_sales(db_conn)["matches_full_rebuild"]
+
+    db_conn.execute(text(
+        "DELETE FROM warehouse.fact_sales WHERE transaction_id IN "
+        "(SELECT transaction_id FROM warehouse.fact_sales ORDER BY transaction_id LIMIT 5)"
+    ))
+    assert lw.verify_fact_sales(db_conn)["missing_rows"] > 0
+
+    result = lw.load_fact_sales(db_conn, "incremental")
+    assert result["inserted"] > 0
+    assert lw.verify_fact_sales(db_conn)["matches_full_rebuild"]
+
+    # A range re-load replaces exactly the facts of that range
+    first_day = db_conn.execute(text("SELECT MIN(transaction_date) FROM warehouse.fact_sales")).scalar()
+    result = lw.load_fact_sales(db_conn, "incremental", (first_day, first_day))
+    assert result["deleted"] == result["inserted"] > 0
+    assert lw.verify_fact_sales(db_conn)["matches_full_rebuild"]
+
+def test_incremental_fact_load_replaces_changed_transactions(lw, db_conn):
+    lw.load_fact_sales(db_conn, "full")
+    changed, extended = db_conn.execute(text(
+        "SELECT item_id, transaction_id FROM production.transaction_items ORDER BY item_id LIMIT 2"
+    )).fetchall()
+    # As the incremental upsert does, both changes move updated_at forward
+    db_conn.execute(text(
+        "UPDATE production.transaction_items SET quantity = quantity + 1, "
+        "line_total = line_total + price_at_time, updated_at = clock_timestamp() WHERE item_id = :id"
+    ), {"id": changed.item_id})
+    db_conn.execute(text("""
+        INSERT INTO production.transaction_items
+            (transaction_id, product_id, quantity, price_at_time, line_total, updated_at)
+        SELECT :t, product_id, 1, price, price, clock_timestamp() FROM production.products
+        WHERE product_id NOT IN (SELECT product_id FROM production.transaction_items WHERE transaction_id = :t)
+        LIMIT 1
+    """), {"t": extended.transaction_id})
+    assert not lw.verify_fact_sales(db_conn)["matches_full_rebuild"]
+
+    result = lw.load_fact_sales(db_conn, "incremental")
+    assert result["deleted"] > 0 and result["inserted"] > 0
+    assert lw.verify_fact_sales(db_conn)["matches_full_rebuild"]
+
+    # Nothing changed since: the next incremental load is a no-op
+    result = lw.load_fact_sales(db_conn, "incremental")
+    assert result["deleted"] == result["inserted"] == 0
+
+def test_fact_sales_partition_swap_and_pruning(lw, db_conn):
+    lw.load_fact_sales(db_conn, "full")
+    assert lw.fact_sales_is_partitioned(db_conn)
+
+    month = lw.month_start(db_conn.execute(text("SELECT MIN(transaction_date) FROM warehouse.fact_sales")).scalar())
+    before = db_conn.execute(text(f"SELECT COUNT(*) FROM warehouse.{lw.partition_name(month)}")).scalar()
+    replaced, loaded = lw.swap_fact_partition(db_conn, month)
+    assert replaced == loaded == before > 0
+    assert lw.verify_fact_sales(db_conn)["matches_full_rebuild"]
+
+    plan = "\n".join(db_conn.execute(text(
+        "EXPLAIN SELECT SUM(line_total) FROM warehouse.fact_sales "
+        "WHERE transaction_date >= :start AND transaction_date < :start + INTERVAL '1 month'"
+    ), {"start": month}).scalars())
+    assert lw.partition_name(month) in plan
+    assert plan.count("fact_sales_p") == 1
+
+def test_aggregates_are_maintained_from_the_fact_delta(lw, db_conn):
+    lw.load_fact_sales(db_conn, "full")
+    # Drop the newest transactions so the next incremental load brings them back as new facts
+    db_conn.execute(text(
+        "DELETE FROM warehouse.fact_sales WHERE transaction_id IN "
+        "(SELECT transaction_id FROM production.transactions "
+        " ORDER BY transaction_date DESC, transaction_id LIMIT 10)"
+    ))
+    lw.refresh_aggregates(db_conn, full=True)
+
+    lw.load_fact_sales(db_conn, "incremental")
+    touched = lw.refresh_aggregates(db_conn, full=False)
+    assert 0 < touched["agg_daily_sales"] <= 10
+    assert not any(lw.verify_aggregates(db_conn).values())
+
+    # A partial-month reload removes and re-adds facts
+    first_day = db_conn.execute(text("SELECT MIN(transaction_date) FROM warehouse.fact_sales")).scalar()
+    lw.load_fact_sales(db_conn, "incremental", (first_day, first_day))
+    lw.refresh_aggregates(db_conn, full=False)
+    assert not any(lw.verify_aggregates(db_conn).values())
+
+    # Aggregates consistent with drifted facts still differ from a rebuild
+    db_conn.execute(text("DELETE FROM warehouse.fact_sales WHERE transaction_date = :d"), {"d": first_day})
+    lw.refresh_aggregates(db_conn, full=True)
+    assert lw.verify_aggregates(db_conn)["agg_daily_sales"] > 0
+
+def test_deferrable_fact_indexes_are_dropped_and_rebuilt(lw, db_conn):
+    def existing(conn):
+        return set(conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'warehouse'"
+        )).scalars())
+
+    lw.ensure_indexes(db_conn)
+    assert set(lw.WAREHOUSE_INDEXES) <= existing(db_conn)
+
+    dropped = lw.drop_deferrable_indexes(db_conn, "fact_sales")
+    assert dropped and not set(dropped) & existing(db_conn)
+    # Indexes the load itself probes are never dropped
+    assert all(lw.WAREHOUSE_INDEXES[name][0] == "fact_sales" for name in dropped)
+    assert "idx_dim_customers_current_key" in existing(db_conn)
+
+    assert sorted(lw.ensure_indexes(db_conn, "fact_sales")) == sorted(dropped)
+
+def test_load_dim_date_adds_only_missing_days(db_conn):
+    db_conn.execute(text("DELETE FROM warehouse.dim_date WHERE date_key BETWEEN '2031-01-01' AND '2031-01-31'"))
+    assert load_dim_date(db_conn, date(2031, 1, 1), date(2031, 1, 10)) == 10
+    assert load_dim_date(db_conn, date(2031, 1, 1), date(2031, 1, 31)) == 21
+    assert load_dim_date(db_conn, date(2031, 1, 1), date(2031, 1, 31)) == 0
+
+def test_record_load_bumps_the_data_version_only_on_change(lw, db_conn):
+    version = lw.record_load(db_conn, "incremental")
+    assert lw.record_load(db_conn, "incremental", changed=False) == version
+    assert lw.record_load(db_conn, "full") == version + 1